@@ -0,0 +1,175 @@
+"""In-memory relevance search over the mushroom catalog.
+
+Text is accent-folded and tokenized, and every token of the vocabulary is
+indexed by its character trigrams. A query token matches vocabulary tokens
+that are equal, that it is a prefix of, or that share enough trigrams with it
+(typo tolerance). PrefixIndex serves name autocomplete. Neither index holds a
+database handle; server.py keeps them in sync with the catalog cache.
+"""
+import bisect
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    "common_name": 3.0,
+    "latin_name": 3.0,
+    "characteristics": 1.0,
+    "habitat": 1.0,
+}
+# Minimum trigram Dice coefficient for a fuzzy token match
+MIN_SIMILARITY = 0.5
+PREFIX_SIMILARITY = 0.9
+MIN_PREFIX_LENGTH = 2
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents so "Cèpe" and "cepe" compare equal"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _NON_WORD.split(fold(text)) if token]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}  # token -> {doc id: field weight}
+        self.token_trigrams: Dict[str, Set[str]] = {}  # trigram -> tokens containing it
+        self.doc_tokens: Dict[str, Dict[str, float]] = {}  # doc id -> {token: field weight}
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    def add(self, doc_id: str, fields: Dict[str, object]):
+        """Index a document; fields map FIELD_WEIGHTS names to a string or list of strings"""
+        self.remove(doc_id)
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = fields.get(field) or ""
+            texts = value if isinstance(value, list) else [value]
+            for text in texts:
+                for token in tokenize(str(text)):
+                    weights[token] = max(weights.get(token, 0.0), weight)
+        self.doc_tokens[doc_id] = weights
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                for gram in trigrams(token):
+                    self.token_trigrams.setdefault(gram, set()).add(token)
+            self.postings[token][doc_id] = weight
+
+    def remove(self, doc_id: str):
+        for token in self.doc_tokens.pop(doc_id, {}):
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[token]
+                for gram in trigrams(token):
+                    tokens = self.token_trigrams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self.token_trigrams[gram]
+
+    def _matching_tokens(self, query_token: str) -> Dict[str, float]:
+        """Vocabulary tokens similar to query_token, with a similarity in (0, 1]"""
+        matches: Dict[str, float] = {}
+        if query_token in self.postings:
+            matches[query_token] = 1.0
+        query_grams = trigrams(query_token)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for token in self.token_trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            if len(query_token) >= MIN_PREFIX_LENGTH and token.startswith(query_token):
+                matches[token] = PREFIX_SIMILARITY
+                continue
+            similarity = 2 * count / (len(query_grams) + len(trigrams(token)))
+            if similarity >= MIN_SIMILARITY:
+                matches[token] = similarity
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Doc ids ranked by relevance: most query tokens matched, then total score"""
+        query_tokens = tokenize(query)
+        matched: Dict[str, int] = {}
+        scores: Dict[str, float] = {}
+        for query_token in query_tokens:
+            best: Dict[str, float] = {}
+            for token, similarity in self._matching_tokens(query_token).items():
+                for doc_id, weight in self.postings[token].items():
+                    best[doc_id] = max(best.get(doc_id, 0.0), similarity * weight)
+            for doc_id, score in best.items():
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        ranked = sorted(scores, key=lambda doc_id: (-matched[doc_id], -scores[doc_id], doc_id))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(doc_id, round(scores[doc_id], 4)) for doc_id in ranked]
+
+
+class PrefixIndex:
+    """Sorted-prefix index answering name autocomplete with two bisects.
+
+    Whole names are kept apart from the names' inner words so that suggestions
+    starting the name ("Cèpe...") come before inner-word hits ("...de Bordeaux").
+    """
+
+    def __init__(self):
+        self.name_keys: List[Tuple[str, str, str]] = []  # sorted (folded name, doc id, name)
+        self.word_keys: List[Tuple[str, str, str]] = []  # same, from each inner word onwards
+        self.doc_keys: Dict[str, List[Tuple[List, Tuple[str, str, str]]]] = {}
+
+    def add(self, doc_id: str, names: List[str]):
+        self.remove(doc_id)
+        keys = []
+        for name in names:
+            words = tokenize(name)
+            if not words:
+                continue
+            keys.append((self.name_keys, (" ".join(words), doc_id, name)))
+            for i in range(1, len(words)):
+                keys.append((self.word_keys, (" ".join(words[i:]), doc_id, name)))
+        for target, key in keys:
+            bisect.insort(target, key)
+        self.doc_keys[doc_id] = keys
+
+    def remove(self, doc_id: str):
+        for target, key in self.doc_keys.pop(doc_id, []):
+            index = bisect.bisect_left(target, key)
+            if index < len(target) and target[index] == key:
+                del target[index]
+
+    def suggest(self, prefix: str, limit: int) -> List[Tuple[str, str]]:
+        """Up to limit (doc id, name) pairs whose name or an inner word starts with prefix"""
+        folded = " ".join(tokenize(prefix))
+        if not folded:
+            return []
+        results: List[Tuple[str, str]] = []
+        seen: Set[str] = set()
+        for target in (self.name_keys, self.word_keys):
+            index = bisect.bisect_left(target, (folded,))
+            while index < len(target) and len(results) < limit:
+                key, doc_id, name = target[index]
+                if not key.startswith(folded):
+                    break
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    results.append((doc_id, name))
+                index += 1
+        return results
@@ -0,0 +1,240 @@
+"""Response compression with gzip or brotli, picked from Accept-Encoding.
+
+Bodies under the minimum size and already compressed media (photos) go out
+untouched. Whenever a response could have been compressed, whatever its size,
+Vary gets Accept-Encoding so caches keep the codings apart, and a compressed
+response's ETag is made weak: the gzip and identity bodies are different bytes
+and must not share a strong validator. Streaming responses are compressed chunk by chunk and flushed after
+each chunk so clients still receive them progressively. Per-route byte counts
+are kept in CompressionStats to measure the bandwidth saved.
+"""
+import gzip
+import zlib
+from typing import Dict, Iterable, Optional
+
+import brotli
+
+# Encodings we can produce, in our order of preference on equal q-values
+SUPPORTED_ENCODINGS = ("br", "gzip")
+# Media types that are already compressed or not worth compressing
+DEFAULT_EXCLUDED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of SUPPORTED_ENCODINGS allowed by an Accept-Encoding header, or None"""
+    q_values: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        q_values[coding] = q
+    best, best_q = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        q = q_values.get(coding, q_values.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def vary_on_encoding(headers: list) -> list:
+    """ASGI headers with Accept-Encoding merged into Vary"""
+    fields = [
+        field.strip()
+        for key, value in headers if key.lower() == b"vary"
+        for field in value.decode("latin-1").split(",") if field.strip()
+    ]
+    if "*" in fields or "accept-encoding" in (field.lower() for field in fields):
+        return headers
+    fields.append("Accept-Encoding")
+    return [(key, value) for key, value in headers if key.lower() != b"vary"] + [
+        (b"vary", ", ".join(fields).encode("latin-1"))
+    ]
+
+
+def weaken_etag(headers: list) -> list:
+    """ASGI headers with a strong ETag turned into the weak W/ form"""
+    return [
+        (key, b"W/" + value if key.lower() == b"etag" and not value.startswith(b"W/") else value)
+        for key, value in headers
+    ]
+
+
+def revalidates_weak_etag(headers: list, if_none_match: bytes) -> bool:
+    """Whether If-None-Match holds the weak form of the response's ETag"""
+    etag = next((value for key, value in headers if key.lower() == b"etag"), None)
+    return etag is not None and b"W/" + etag in [tag.strip() for tag in if_none_match.split(b",")]
+
+
+class Compressor:
+    """Incremental gzip or brotli compressor"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16+ writes a gzip header and trailer around the deflate stream
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionStats:
+    """Bytes before and after compression, per route"""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, encoding: Optional[str], raw_bytes: int, sent_bytes: int):
+        counters = self.routes.setdefault(
+            route, {"responses": 0, "compressed": 0, "raw_bytes": 0, "sent_bytes": 0}
+        )
+        counters["responses"] += 1
+        counters["compressed"] += encoding is not None
+        counters["raw_bytes"] += raw_bytes
+        counters["sent_bytes"] += sent_bytes
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for route, counters in sorted(self.routes.items()):
+            saved = counters["raw_bytes"] - counters["sent_bytes"]
+            report[route] = {
+                **counters,
+                "saved_bytes": saved,
+                "saved_ratio": round(saved / counters["raw_bytes"], 4) if counters["raw_bytes"] else 0.0,
+            }
+        return report
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware, so streaming responses stay streaming"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        excluded_types: Iterable[str] = DEFAULT_EXCLUDED_TYPES,
+        stats: Optional[CompressionStats] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_types = tuple(excluded_types)
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if_none_match = headers.get(b"if-none-match", b"")
+
+        start_message = None
+        compressor = None
+        used_encoding = None
+        raw_bytes = sent_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, used_encoding, raw_bytes, sent_bytes
+            if message["type"] == "http.response.start":
+                # Hold the headers back until the first body chunk tells us the size
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            raw_bytes += len(body)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                compressible = self._compressible(start)
+                response_headers = vary_on_encoding(start["headers"]) if compressible else start["headers"]
+                if start["status"] == 304 and revalidates_weak_etag(start["headers"], if_none_match):
+                    # The client holds the compressed body, whose ETag we sent as weak
+                    response_headers = weaken_etag(response_headers)
+                if not (compressible and self._should_compress(start, encoding, body, more_body)):
+                    sent_bytes += len(body)
+                    await send({**start, "headers": response_headers})
+                    await send(message)
+                    return
+                used_encoding = encoding
+                response_headers = [
+                    (key, value) for key, value in weaken_etag(response_headers) if key.lower() != b"content-length"
+                ]
+                response_headers.append((b"content-encoding", encoding.encode()))
+                if more_body:
+                    compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                    body = compressor.compress(body)
+                else:
+                    body = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                    response_headers.append((b"content-length", str(len(body)).encode()))
+                sent_bytes += len(body)
+                await send({**start, "headers": response_headers})
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if compressor is None:
+                sent_bytes += len(body)
+                await send(message)
+                return
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            sent_bytes += len(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+        if self.stats is not None:
+            route = scope.get("route")
+            self.stats.record(
+                f'{scope["method"]} {getattr(route, "path", "unmatched")}',
+                used_encoding,
+                raw_bytes,
+                sent_bytes,
+            )
+
+    def _compressible(self, start) -> bool:
+        """Whether the response is compressed for clients accepting it, body size permitting"""
+        if start["status"] in (204, 206):
+            return False
+        response_headers = {key.lower(): value for key, value in start["headers"]}
+        if b"content-encoding" in response_headers:
+            return False
+        content_type = response_headers.get(b"content-type", b"").decode("latin-1").lower()
+        return not content_type.startswith(self.excluded_types)
+
+    def _should_compress(self, start, encoding: Optional[str], body: bytes, more_body: bool) -> bool:
+        if encoding is None or start["status"] == 304:
+            return False
+        # A streamed body may well grow past the threshold, so only size-check complete bodies
+        return more_body or len(body) >= self.minimum_size
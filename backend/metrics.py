@@ -0,0 +1,135 @@
+"""Prometheus metrics for HTTP requests and MongoDB commands.
+
+MetricsMiddleware times every request and labels it with the matched route
+template (not the raw path, to keep label cardinality bounded).
+MongoCommandListener is registered on the Motor client and times every
+command the driver sends, labeled by command and collection. Storage
+repository calls are timed too (see storage.TimedRepository), whatever the
+backend, so storage time can be compared with request latency. The startup
+phases and the cold start to first byte come from startup.py's timer.
+Everything lives in the process's default registry and is served by
+server.py at /metrics; nothing external is needed.
+"""
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+
+# Request latencies in seconds, from cache hits to slow bulk imports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Payload sizes in bytes, from empty bodies to photo uploads
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "Size of HTTP request bodies", ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of HTTP response bodies as sent", ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ["method"]
+)
+MONGO_COMMANDS = Histogram(
+    "mongodb_command_duration_seconds", "Time for MongoDB to answer a command",
+    ["command", "collection", "outcome"], buckets=MONGO_BUCKETS,
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "startup_phase_duration_seconds", "Time spent in each phase of the last startup", ["phase"]
+)
+COLD_START_SECONDS = Gauge(
+    "cold_start_first_byte_seconds", "Time from process start to the first response byte (0 until then)"
+)
+STORAGE_OPERATIONS = Histogram(
+    "storage_operation_duration_seconds", "Time spent in a storage repository call",
+    ["backend", "repository", "operation"], buckets=MONGO_BUCKETS,
+)
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed bodies are measured as they are sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        request_bytes = response_bytes = 0
+
+        async def receive_wrapper():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route, str(status)).observe(elapsed)
+            HTTP_REQUEST_SIZE.labels(method, route).observe(request_bytes)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(response_bytes)
+
+
+def command_collection(command_name: str, command) -> str:
+    """Collection a command targets; most commands name it as their first value"""
+    if command_name == "getMore":
+        target = command.get("collection")
+    else:
+        target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds MONGO_COMMANDS from PyMongo command monitoring events"""
+
+    def __init__(self):
+        # (connection, request id) -> collection; the name is only on the started event
+        self.pending: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event):
+        self.pending[(event.connection_id, event.request_id)] = command_collection(
+            event.command_name, event.command
+        )
+
+    def _finish(self, event, outcome: str):
+        collection = self.pending.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMANDS.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "succeeded")
+
+    def failed(self, event):
+        self._finish(event, "failed")
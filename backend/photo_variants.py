@@ -0,0 +1,84 @@
+"""Photo resizing for server.py.
+
+These functions run inside a process pool, so this module only imports what
+the workers need and never touches the database or the FastAPI app. Pillow is
+imported by the workers only, keeping it out of the server's startup.
+"""
+import os
+import warnings
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+
+# Longest edge in pixels for each generated variant; "original" is served as stored
+VARIANT_SIZES = {
+    "thumbnail": 256,
+    "medium": 1024,
+}
+JPEG_QUALITY = 80
+
+
+class InvalidPhoto(ValueError):
+    """The bytes look like an image but cannot be decoded"""
+
+
+class PhotoTooLarge(ValueError):
+    """The image has more pixels than Pillow's MAX_IMAGE_PIXELS (a decompression bomb)"""
+
+
+def variant_path(cache_dir: str, content_hash: str, size: str) -> Path:
+    return Path(cache_dir) / f"{content_hash}_{size}.jpg"
+
+
+@contextmanager
+def open_image(data: bytes):
+    """Image.open, with Pillow's errors turned into InvalidPhoto or PhotoTooLarge.
+
+    The server process never imports Pillow, so it can only catch exceptions
+    defined here. Images over MAX_IMAGE_PIXELS are rejected outright rather
+    than just warned about.
+    """
+    from PIL import Image
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(BytesIO(data)) as image:
+                yield image
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise PhotoTooLarge(str(e)) from None
+    except (InvalidPhoto, PhotoTooLarge):
+        raise
+    except Exception as e:
+        # Truncated or corrupt files raise anything from OSError to SyntaxError
+        raise InvalidPhoto(f"{type(e).__name__}: {e}") from None
+
+
+def check_image(data: bytes) -> None:
+    """Validate a photo's header and structure without decoding its pixels"""
+    with open_image(data) as image:
+        image.verify()
+
+
+def remove_variants(cache_dir: str, content_hash: str) -> None:
+    for size in VARIANT_SIZES:
+        variant_path(cache_dir, content_hash, size).unlink(missing_ok=True)
+
+
+def render_variants(data: bytes, cache_dir: str, content_hash: str) -> None:
+    """Decode a photo once and write every missing variant to the disk cache"""
+    from PIL import ImageOps
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open_image(data) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size, max_edge in VARIANT_SIZES.items():
+            path = variant_path(cache_dir, content_hash, size)
+            if path.exists():
+                continue
+            variant = image.copy()
+            variant.thumbnail((max_edge, max_edge))
+            # Write then rename so readers never see a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            variant.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            os.replace(tmp_path, path)
@@ -0,0 +1,169 @@
+"""Opt-in sampling profiler for single requests.
+
+A request is profiled when it carries the admin token in the X-Profile header
+(never in the query string, which ends up in access logs and browser history),
+or when it falls in the random sample rate.
+pyinstrument samples the call stack of the request's task; in async mode the
+time a coroutine spends awaiting (Motor round trips, for instance) shows up
+as [await] under the frame that awaited, and Pydantic validation appears as
+ordinary frames. Sessions are saved under the profile directory and rendered
+on demand (HTML call tree, speedscope flame graph or plain text). pyinstrument
+is only imported once a request is actually profiled, so it costs nothing at
+startup. Saving, pruning and rendering sessions touch the disk, so they run in
+a thread rather than on the event loop.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_FORMATS = {
+    "html": "text/html",
+    "speedscope": "application/json",
+    "text": "text/plain",
+}
+
+
+class ProfileStore:
+    """Profiled sessions on disk, newest last; only the most recent `keep` are kept"""
+
+    def __init__(self, directory: Path, keep: int = 50):
+        self.directory = directory
+        self.keep = keep
+        self.entries: Deque[Dict] = deque()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for sidecar in sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime):
+            try:
+                self.entries.append(json.loads(sidecar.read_text()))
+            except (OSError, ValueError):
+                continue
+        self._prune()
+
+    def _paths(self, profile_id: str):
+        return self.directory / f"{profile_id}.pyisession", self.directory / f"{profile_id}.json"
+
+    def _write(self, session, entry: Dict):
+        session_path, sidecar = self._paths(entry["id"])
+        session.save(str(session_path))
+        sidecar.write_text(json.dumps(entry))
+
+    def _delete(self, profile_ids: List[str]):
+        for profile_id in profile_ids:
+            for path in self._paths(profile_id):
+                path.unlink(missing_ok=True)
+
+    def _evict(self) -> List[str]:
+        """Drop the oldest entries over `keep`; returns their ids"""
+        evicted = []
+        while len(self.entries) > self.keep:
+            evicted.append(self.entries.popleft()["id"])
+        return evicted
+
+    def _prune(self):
+        self._delete(self._evict())
+
+    async def save(self, session, entry: Dict):
+        """Write a session in a thread; entries is only ever changed on the event loop"""
+        await asyncio.to_thread(self._write, session, entry)
+        self.entries.append(entry)
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(self._delete, evicted)
+
+    def list(self) -> List[Dict]:
+        return list(reversed(self.entries))
+
+    async def render(self, profile_id: str, fmt: str) -> Optional[str]:
+        """A stored session rendered as one of PROFILE_FORMATS, or None if unknown"""
+        if not any(entry["id"] == profile_id for entry in self.entries):
+            return None
+        try:
+            return await asyncio.to_thread(self._render, profile_id, fmt)
+        except FileNotFoundError:
+            # Pruned in the meantime
+            return None
+
+    def _render(self, profile_id: str, fmt: str) -> str:
+        from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+        from pyinstrument.session import Session
+
+        session = Session.load(str(self._paths(profile_id)[0]))
+        if fmt == "speedscope":
+            renderer = SpeedscopeRenderer()
+        elif fmt == "text":
+            renderer = ConsoleRenderer(unicode=True, color=False, show_all=False)
+        else:
+            renderer = HTMLRenderer()
+        return renderer.render(session)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that wraps selected requests in a pyinstrument Profiler"""
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        # pyinstrument hooks the interpreter's profiling function, so one request at a time
+        self.active = False
+
+    def wants_profile(self, scope) -> bool:
+        if self.token:
+            header = dict(scope["headers"]).get(PROFILE_HEADER.lower().encode(), b"").decode("latin-1")
+            if header == self.token:
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active or not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message["headers"], (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())],
+                }
+            await send(message)
+
+        from pyinstrument import Profiler
+
+        self.active = True
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        started_at = time.time()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            self.active = False
+            await self.store.save(session, {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", "unmatched"),
+                "status": status,
+                "started_at": started_at,
+                "duration_seconds": round(session.duration, 6),
+                "sample_count": session.sample_count,
+            })
@@ -0,0 +1,299 @@
+"""Synthetic data generator for local load and performance work.
+
+    python seed.py spots --count 1000000 --photo-fraction 0.2
+    python seed.py catalog --count 500
+    python seed.py spots --count 10000000 --defer-indexes --drop
+
+Spots are clustered around randomly placed forests (a few large ones, many
+small ones), dated in their species' fruiting season over the last years and
+typed following a skewed distribution. Photos are optional: a small pool of
+JPEGs of the requested size is stored through the normal photo pipeline and
+shared between spots (deleting one of them keeps the photo while the others
+still use it). Documents are written in batches through the storage
+backend's insert_many, several in flight at once; with Mongo, --defer-indexes
+drops the secondary indexes for the load and rebuilds them once at the end,
+which is what makes ten million documents a matter of minutes. Uses
+STORAGE_BACKEND, SQLITE_PATH, MONGO_URL and DB_NAME like server.py (photos
+go to GridFS, so --photo-fraction needs the mongo backend).
+"""
+import asyncio
+import io
+import math
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+import typer
+from PIL import Image
+
+import server
+
+cli = typer.Typer(help=__doc__.split("\n\n")[0], add_completion=False)
+
+# Mainland France, where the forests are placed
+LAT_RANGE = (43.0, 50.5)
+LON_RANGE = (-1.5, 7.5)
+KM_PER_DEGREE = 111.32
+# (mushroom type, share of spots, fruiting months)
+SPOT_TYPES = [
+    ("Cèpe de Bordeaux", 0.22, (8, 9, 10)),
+    ("Girolle", 0.18, (6, 7, 8, 9)),
+    ("Trompette de la mort", 0.12, (9, 10, 11)),
+    ("Pied de mouton", 0.10, (8, 9, 10, 11)),
+    ("Morille", 0.08, (3, 4, 5)),
+    ("Lactaire délicieux", 0.08, (8, 9, 10)),
+    ("Coulemelle", 0.08, (7, 8, 9, 10)),
+    ("Amanite phalloïde", 0.06, (7, 8, 9, 10)),
+    ("Mousseron", 0.05, (4, 5, 6, 10)),
+    ("Cèpe d'été", 0.03, (6, 7, 8)),
+]
+NOTES = [
+    "",
+    "",
+    "Sous les hêtres, près du ruisseau",
+    "Lisière de la forêt, côté sud",
+    "Au pied des chênes",
+    "Dans la mousse sous les épicéas",
+    "Coin humide après la pluie",
+    "Beaucoup de jeunes spécimens",
+]
+GENERA = [
+    ("Bolet", "Boletus"), ("Lactaire", "Lactarius"), ("Russule", "Russula"), ("Amanite", "Amanita"),
+    ("Clitocybe", "Clitocybe"), ("Cortinaire", "Cortinarius"), ("Tricholome", "Tricholoma"),
+    ("Hygrophore", "Hygrophorus"), ("Pholiote", "Pholiota"), ("Agaric", "Agaricus"),
+]
+EPITHETS = [
+    ("des bois", "silvaticus"), ("jaune", "luteus"), ("odorant", "odorus"), ("blafard", "pallidus"),
+    ("à pied rouge", "erythropus"), ("des prés", "pratensis"), ("sanguin", "sanguineus"),
+    ("élégant", "elegans"), ("trompeur", "fallax"), ("tardif", "serotinus"),
+]
+EDIBILITY = ["comestible", "comestible", "non_comestible", "toxique", "mortel", "comestible_conditionnel"]
+SEASONS = ["Printemps", "Été", "Été - Automne", "Automne", "Automne - Hiver"]
+HABITATS = ["Forêts de feuillus", "Forêts de conifères", "Prairies", "Lisières", "Forêts mixtes"]
+
+
+def make_forests(rng: random.Random, count: int):
+    """Forest centers with a heavy-tailed size: (latitude, longitude, radius in km, weight)"""
+    forests = []
+    for _ in range(count):
+        size = rng.paretovariate(1.5)
+        forests.append((rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE), min(1.0 + 2.0 * size, 25.0), size))
+    return forests
+
+
+def seasonal_timestamp(rng: random.Random, months, now: datetime, years: int) -> datetime:
+    """A daytime timestamp in one of the given months, within the last `years` years"""
+    stamp = datetime(now.year - rng.randrange(years), rng.choice(months), rng.randint(1, 28),
+                     rng.randint(7, 18), rng.randrange(60), rng.randrange(60))
+    if stamp > now:
+        stamp = stamp.replace(year=stamp.year - 1)
+    return stamp
+
+
+def spot_batch(rng, forests, forest_weights, type_weights, size, first_seq, now, years, photo_ids, photo_fraction):
+    documents = []
+    for offset in range(size):
+        latitude, longitude, radius_km, _ = rng.choices(forests, cum_weights=forest_weights)[0]
+        latitude += rng.gauss(0, radius_km) / KM_PER_DEGREE
+        longitude += rng.gauss(0, radius_km) / (KM_PER_DEGREE * math.cos(math.radians(latitude)))
+        latitude, longitude = round(latitude, 6), round(longitude, 6)
+        mushroom_type, _, months = rng.choices(SPOT_TYPES, cum_weights=type_weights)[0]
+        documents.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "latitude": latitude,
+            "longitude": longitude,
+            "mushroom_type": mushroom_type,
+            "notes": rng.choice(NOTES),
+            "photo_id": rng.choice(photo_ids) if photo_ids and rng.random() < photo_fraction else None,
+            "timestamp": seasonal_timestamp(rng, months, now, years),
+            "created_by": "Utilisateur" if rng.random() < 0.8 else f"cueilleur_{rng.randrange(500)}",
+            "updated_seq": first_seq + offset,
+        })
+    return documents
+
+
+def jpeg_of_size(rng: random.Random, target_bytes: int) -> bytes:
+    """A noise JPEG of roughly target_bytes (noise compresses to about one byte per pixel)"""
+    side = max(16, int(math.sqrt(target_bytes)))
+    image = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def seed_photos(rng: random.Random, pool: int, photo_kb: int) -> List[str]:
+    photo_ids = []
+    for _ in range(pool):
+        target = int(rng.lognormvariate(math.log(photo_kb * 1024), 0.5))
+        data = jpeg_of_size(rng, min(target, server.PHOTO_MAX_BYTES // 2))
+        photo_ids.append(await server.store_photo(data))
+    # Attached up front: the spots are inserted without going through claim_photo
+    await server.attach_photos(photo_ids)
+    return photo_ids
+
+
+async def insert_batch(repository, batch) -> int:
+    failures = await repository.insert_many(batch)
+    return len(batch) - len(failures)
+
+
+async def insert_batches(repository, batches, parallel: int, total: int, label: str):
+    """insert_many every batch with up to `parallel` batches in flight"""
+    in_flight = set()
+    inserted = 0
+    started = time.perf_counter()
+    for batch in batches:
+        if len(in_flight) >= parallel:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                inserted += task.result()
+            elapsed = time.perf_counter() - started
+            typer.echo(f"{label}: {inserted}/{total} ({inserted / elapsed:,.0f} docs/s)")
+        in_flight.add(asyncio.ensure_future(insert_batch(repository, batch)))
+    for task in asyncio.as_completed(in_flight):
+        inserted += await task
+    elapsed = time.perf_counter() - started
+    typer.echo(f"{label}: {inserted} documents in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} docs/s)")
+    return inserted
+
+
+def require_mongo(option: str):
+    if server.STORAGE_BACKEND != "mongo":
+        raise typer.BadParameter(f"{option} needs STORAGE_BACKEND=mongo")
+
+
+def require_persistent_storage():
+    if server.STORAGE_BACKEND == "memory":
+        raise typer.BadParameter("STORAGE_BACKEND=memory keeps nothing once seeding ends, use mongo or sqlite")
+
+
+async def drop_secondary_indexes(collection_name: str):
+    await server.db[collection_name].drop_indexes()
+    typer.echo(f"Dropped secondary indexes on {collection_name}; they are rebuilt after the load")
+
+
+async def with_storage(seeding):
+    await server.storage.startup()
+    try:
+        await seeding
+    finally:
+        await server.storage.close()
+
+
+async def seed_spots(count, batch_size, parallel, forests, years, photo_fraction, photo_pool, photo_kb,
+                     seed, drop, defer_indexes):
+    rng = random.Random(seed)
+    if drop:
+        await server.db.mushroom_spots.drop()
+        if not defer_indexes:
+            # Dropping the collection dropped its indexes too
+            await server.ensure_indexes()
+    if defer_indexes:
+        await drop_secondary_indexes("mushroom_spots")
+    photo_ids = await seed_photos(rng, photo_pool, photo_kb) if photo_fraction > 0 else []
+    forest_list = make_forests(rng, forests)
+    forest_weights = list(_cumulative(forest[3] for forest in forest_list))
+    type_weights = list(_cumulative(share for _, share, _ in SPOT_TYPES))
+    first_seq = await server.next_seq(count) if count else 0
+    now = datetime.utcnow()
+
+    def batches():
+        for start in range(0, count, batch_size):
+            yield spot_batch(rng, forest_list, forest_weights, type_weights, min(batch_size, count - start),
+                             first_seq + start, now, years, photo_ids, photo_fraction)
+
+    await insert_batches(server.storage.spots, batches(), parallel, count, "mushroom_spots")
+    if defer_indexes:
+        started = time.perf_counter()
+        await server.ensure_indexes()
+        typer.echo(f"Indexes rebuilt in {time.perf_counter() - started:.1f}s")
+    await server.bump_collection_version("mushroom_spots")
+
+
+def catalog_entry(rng: random.Random, index: int, seq: int) -> dict:
+    genus, latin_genus = GENERA[index % len(GENERA)]
+    epithet, latin_epithet = EPITHETS[(index // len(GENERA)) % len(EPITHETS)]
+    variety = index // (len(GENERA) * len(EPITHETS))
+    suffix = f" var. {variety}" if variety else ""
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "common_name": f"{genus} {epithet}{suffix}",
+        "latin_name": f"{latin_genus} {latin_epithet}{suffix}",
+        "edibility": rng.choice(EDIBILITY),
+        "season": rng.choice(SEASONS),
+        "description": f"{genus} {epithet} généré pour les tests de charge.",
+        "characteristics": rng.sample(["Chapeau brun", "Lames blanches", "Pied épais", "Odeur anisée",
+                                       "Chair ferme", "Anneau membraneux", "Volve à la base"], 3),
+        "habitat": rng.choice(HABITATS),
+        "lookalikes": [],
+        "photo_urls": [],
+        "photos_base64": [],
+        "updated_seq": seq,
+    }
+
+
+async def seed_catalog(count, batch_size, seed, drop):
+    rng = random.Random(seed)
+    if drop:
+        await server.db.mushroom_database.drop()
+        await server.ensure_indexes()
+    first_seq = await server.next_seq(count) if count else 0
+    batches = (
+        [catalog_entry(rng, index, first_seq + index) for index in range(start, min(start + batch_size, count))]
+        for start in range(0, count, batch_size)
+    )
+    await insert_batches(server.storage.catalog, batches, 1, count, "mushroom_database")
+    await server.bump_collection_version("mushroom_database")
+
+
+def _cumulative(values):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+
+@cli.command()
+def spots(
+    count: int = typer.Option(100000, help="Number of spots to insert"),
+    batch_size: int = typer.Option(10000, help="Documents per insert_many"),
+    parallel: int = typer.Option(4, help="insert_many batches in flight"),
+    forests: int = typer.Option(300, help="Number of forest clusters"),
+    years: int = typer.Option(3, help="Spread timestamps over this many past seasons"),
+    photo_fraction: float = typer.Option(0.0, min=0.0, max=1.0, help="Share of spots with a photo"),
+    photo_pool: int = typer.Option(20, help="Distinct photos shared by those spots"),
+    photo_kb: int = typer.Option(800, help="Median photo size in KiB"),
+    seed: int = typer.Option(42, help="Random seed, for reproducible datasets"),
+    drop: bool = typer.Option(False, help="Drop mushroom_spots first (Mongo only)"),
+    defer_indexes: bool = typer.Option(False, help="Build secondary indexes after the load (Mongo only)"),
+):
+    """Insert synthetic mushroom spots"""
+    require_persistent_storage()
+    if drop:
+        require_mongo("--drop")
+    if defer_indexes:
+        require_mongo("--defer-indexes")
+    if photo_fraction > 0:
+        require_mongo("--photo-fraction")
+    asyncio.run(with_storage(seed_spots(count, batch_size, parallel, forests, years, photo_fraction, photo_pool,
+                                        photo_kb, seed, drop, defer_indexes)))
+
+
+@cli.command()
+def catalog(
+    count: int = typer.Option(200, help="Number of catalog entries to insert"),
+    batch_size: int = typer.Option(1000, help="Documents per insert_many"),
+    seed: int = typer.Option(42, help="Random seed, for reproducible datasets"),
+    drop: bool = typer.Option(False, help="Drop mushroom_database first (Mongo only)"),
+):
+    """Insert synthetic mushroom catalog entries"""
+    require_persistent_storage()
+    if drop:
+        require_mongo("--drop")
+    asyncio.run(with_storage(seed_catalog(count, batch_size, seed, drop)))
+
+
+if __name__ == "__main__":
+    cli()
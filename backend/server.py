@@ -1,27 +1,101 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile
+# Imported first so the imports below are measured as part of the cold start
+from startup import FirstByteMiddleware, startup_timer
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, File, UploadFile, Query, Response, Header, Request, Depends
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel, UpdateOne
+from pymongo.errors import OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, List, Literal, Optional, Union
 import uuid
-from datetime import datetime
+import json
+import csv
+import io
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import time
+import bisect
 import base64
+import binascii
+import msgpack
+import cbor2
+import asyncio
+import hashlib
+from photo_variants import VARIANT_SIZES, PhotoTooLarge, check_image, remove_variants, render_variants, variant_path
+from catalog_search import PrefixIndex, SearchIndex, fold
+from compression import CompressionMiddleware, CompressionStats
+from metrics import COLD_START_SECONDS, STARTUP_PHASE_SECONDS, MetricsMiddleware, MongoCommandListener, metrics_payload
+from profiling import PROFILE_FORMATS, ProfileStore, ProfilingMiddleware
+from storage import create_storage, naive_utc
+
+startup_timer.mark("imports")
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Spots, catalog and status checks go through a storage backend (see storage.py):
+# mongo in production, memory or sqlite for local tests and storage benchmarks.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo")
+if STORAGE_BACKEND == "mongo":
+    # MongoDB connection
+    mongo_url = os.environ['MONGO_URL']
+    # Every command is timed into the mongodb_command_duration_seconds histogram
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener()])
+    db = client[os.environ['DB_NAME']]
+    # Spot photos are stored as raw bytes in GridFS (photos.files / photos.chunks)
+    photo_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="photos")
+else:
+    # The other backends run without MongoDB; photo routes answer 503 (see require_photo_bucket)
+    client = db = photo_bucket = None
+# Status checks expire after this long; per-client counters (status_clients) are kept
+STATUS_CHECK_TTL_SECONDS = int(os.environ.get("STATUS_CHECK_TTL_SECONDS", str(7 * 24 * 3600)))
+storage = create_storage(
+    STORAGE_BACKEND, db, sqlite_path=os.environ.get("SQLITE_PATH", str(ROOT_DIR / "mushrooms.sqlite3")),
+    status_ttl_seconds=STATUS_CHECK_TTL_SECONDS,
+)
+
+# Photo resizing runs in worker processes so decoding never blocks the event loop.
+# "spawn" keeps the workers free of the parent's Mongo client and sockets. The
+# pool, and multiprocessing itself, is set up on the first photo rather than at
+# import, to keep it off the cold start.
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+image_executor = None
+
+def get_image_executor():
+    global image_executor
+    if image_executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        image_executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return image_executor
+
+PHOTO_CACHE_DIR = os.environ.get("PHOTO_CACHE_DIR", str(ROOT_DIR / "photo_cache"))
+# Request profiles (see profiling.py); on-demand profiling and the admin routes need the token
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN")
+profile_store = ProfileStore(
+    Path(os.environ.get("PROFILE_DIR", str(ROOT_DIR / "profiles"))),
+    keep=int(os.environ.get("PROFILE_KEEP", "50")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_db_client()
+    yield
+    await shutdown_db_client()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -36,6 +110,12 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class StatusClientSummary(BaseModel):
+    client_name: str
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+
 # Mushroom Spot Models
 class MushroomSpot(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -43,23 +123,82 @@ class MushroomSpot(BaseModel):
     longitude: float
     mushroom_type: str
     notes: str = ""
-    photo_base64: Optional[str] = None
+    photo_id: Optional[str] = None  # GridFS file id, served by /api/photos/{photo_id}
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     created_by: str = "Utilisateur"  # Default if not provided
+    updated_seq: int = 0  # Global change sequence, see /api/sync
+
+class MushroomSpotSummary(BaseModel):
+    """List view of a spot: the photo is left out, has_photo says whether one exists"""
+    id: str
+    latitude: float
+    longitude: float
+    mushroom_type: str
+    notes: str = ""
+    timestamp: datetime
+    created_by: str = "Utilisateur"
+    photo_id: Optional[str] = None
+    has_photo: bool = False
+
+class MushroomSpotNearby(MushroomSpotSummary):
+    distance_km: float
+
+class SpotCluster(BaseModel):
+    latitude: float  # Centroid of the spots in the cell
+    longitude: float
+    count: int
+
+class ColumnarSpots(BaseModel):
+    """Spots as parallel arrays (layout=columnar), one entry per spot in each list"""
+    types: List[str]  # Distinct mushroom types, referenced by type_index
+    id: List[str]
+    latitude: List[float]
+    longitude: List[float]
+    type_index: List[int]
+    timestamp: List[int]  # Milliseconds since the epoch, UTC
+    has_photo: List[bool]
+
+class ColumnarNearbySpots(ColumnarSpots):
+    distance_km: List[float]
+
+class ViewportSpots(BaseModel):
+    zoom: int
+    clustered: bool
+    spots: Union[List[MushroomSpotSummary], ColumnarSpots] = []
+    # More than VIEWPORT_MAX_SPOTS spots are in the box; only the newest are listed
+    truncated: bool = False
+    clusters: List[SpotCluster] = []
 
 class MushroomSpotCreate(BaseModel):
     latitude: float
     longitude: float
     mushroom_type: str
     notes: str = ""
-    photo_base64: Optional[str] = None
+    photo_id: Optional[str] = None
+    photo_base64: Optional[str] = None  # Moved to GridFS on write, never stored
     created_by: str = "Utilisateur"
 
 class MushroomSpotUpdate(BaseModel):
     mushroom_type: Optional[str] = None
     notes: Optional[str] = None
+    photo_id: Optional[str] = None
     photo_base64: Optional[str] = None
 
+class BulkItemResult(BaseModel):
+    index: int  # Position of the item in the request body
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkCreateResult(BaseModel):
+    inserted: int
+    failed: int
+    results: List[BulkItemResult]
+
+class PhotoInfo(BaseModel):
+    id: str
+    content_type: str
+    length: int
+
 # Mushroom Database Models
 class MushroomLookalike(BaseModel):
     name: str
@@ -79,6 +218,34 @@ class MushroomInfo(BaseModel):
     lookalikes: List[MushroomLookalike] = []
     photo_urls: List[str] = []
     photos_base64: List[str] = []  # Photos en base64
+    updated_seq: int = 0  # Global change sequence, see /api/sync
+
+class MushroomInfoSummary(BaseModel):
+    """List view of a catalog entry without the base64 photos"""
+    id: str
+    common_name: str
+    latin_name: str
+    edibility: str
+    season: str
+    photo_urls: List[str] = []
+    photo_count: int = 0
+
+class Tombstone(BaseModel):
+    collection: str  # "mushroom_spots" or "mushroom_database"
+    id: str
+    updated_seq: int
+
+class SyncChanges(BaseModel):
+    since: int
+    next_since: int  # Pass back as since to continue or for the next sync
+    has_more: bool
+    spots: List[MushroomSpot] = []
+    mushrooms: List[MushroomInfo] = []
+    deleted: List[Tombstone] = []
+
+class MushroomSuggestion(BaseModel):
+    id: str
+    name: str  # The common or latin name that matched
 
 class MushroomInfoCreate(BaseModel):
     common_name: str
@@ -92,77 +259,894 @@ class MushroomInfoCreate(BaseModel):
     photo_urls: List[str] = []
     photos_base64: List[str] = []  # Photos stockées en base64
 
+# Content negotiation for spot and catalog reads: JSON stays the default,
+# compact binary encodings are picked from the Accept header. JSON carries
+# datetimes as ISO 8601 strings; both binary encodings carry them as native
+# UTC timestamps, which their decoders turn back into datetimes: the msgpack
+# Timestamp extension type (-1) and CBOR tag 1 (seconds since the epoch).
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CBOR_MEDIA_TYPE = "application/cbor"
+MEDIA_TYPE_ALIASES = {
+    "application/json": "application/json",
+    "application/msgpack": MSGPACK_MEDIA_TYPE,
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+    "application/cbor": CBOR_MEDIA_TYPE,
+}
+
+def preferred_media_type(accept: Optional[str]) -> str:
+    """Best supported media type for an Accept header, honoring q-values"""
+    best, best_q = "application/json", 0.0
+    for position, item in enumerate((accept or "").split(",")):
+        media_range, _, params = item.strip().partition(";")
+        media_type = MEDIA_TYPE_ALIASES.get(media_range.strip().lower())
+        if media_type is None:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+def encode_extra(value: Any) -> Any:
+    """msgpack fallback: datetimes (stored as naive UTC) become Timestamp extensions"""
+    if isinstance(value, datetime):
+        return msgpack.Timestamp.from_datetime(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def trusted_response(content: Any, request: Request, response: Optional[Response] = None) -> Response:
+    """Encode rows read back from our own collections without re-validating them.
+
+    Returning a Response makes FastAPI skip response_model validation, so only use
+    this for data already shaped like the declared model (a summary projection,
+    the catalog cache or a model_dump). The encoding follows the Accept header.
+    Headers set on the injected response, such as ETag or the next cursor, are
+    carried over.
+    """
+    media_type = preferred_media_type(request.headers.get("accept"))
+    if media_type == MSGPACK_MEDIA_TYPE:
+        encoded = Response(msgpack.packb(content, default=encode_extra, use_bin_type=True), media_type=media_type)
+    elif media_type == CBOR_MEDIA_TYPE:
+        encoded = Response(
+            cbor2.dumps(content, timezone=timezone.utc, datetime_as_timestamp=True), media_type=media_type
+        )
+    else:
+        encoded = ORJSONResponse(content)
+    if response is not None:
+        for key, value in response.headers.items():
+            if key not in ("content-length", "content-type"):
+                encoded.headers[key] = value
+    encoded.headers["Vary"] = "Accept"
+    return encoded
+
+def columnar_spots(spots: List[dict], extra_columns: tuple = ()) -> dict:
+    """Spot rows in the ColumnarSpots shape; mushroom types are sent once and referenced by index"""
+    types, type_index = [], {}
+    columns = {"id": [], "latitude": [], "longitude": [], "type_index": [], "timestamp": [], "has_photo": []}
+    columns.update({column: [] for column in extra_columns})
+    for spot in spots:
+        index = type_index.get(spot["mushroom_type"])
+        if index is None:
+            index = type_index[spot["mushroom_type"]] = len(types)
+            types.append(spot["mushroom_type"])
+        columns["id"].append(spot["id"])
+        columns["latitude"].append(spot["latitude"])
+        columns["longitude"].append(spot["longitude"])
+        columns["type_index"].append(index)
+        # Milliseconds since the epoch (stored timestamps are naive UTC)
+        columns["timestamp"].append(int(spot["timestamp"].replace(tzinfo=timezone.utc).timestamp() * 1000))
+        columns["has_photo"].append(spot["has_photo"])
+        for column in extra_columns:
+            columns[column].append(spot[column])
+    return {"types": types, **columns}
+
+# Bulk creation
+BULK_MAX_ITEMS = 10000
+BULK_CHUNK_SIZE = 1000
+BULK_PHOTO_CONCURRENCY = 2 * IMAGE_WORKERS  # base64 photos checked and stored at once
+
+# Photo storage
+PHOTO_MAX_BYTES = 10 * 1024 * 1024
+PHOTO_CHUNK_SIZE = 255 * 1024
+# Photos stay pending until a spot references them; the startup sweep deletes
+# the ones still pending after this long (uploads the client never attached).
+# A spot write claims a pending photo first, so no two spots can take the same one.
+PHOTO_PENDING_TTL_SECONDS = int(os.environ.get("PHOTO_PENDING_TTL_SECONDS", str(24 * 3600)))
+PHOTO_CLAIMED = "claimed"  # metadata.pending while the claiming spot write runs
+PHOTO_UNAVAILABLE = "Unknown photo_id, or already used by another spot"
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),  # Checked together with the WEBP tag below
+]
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """Content type from the file signature, None if it is not a known image"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            if content_type == "image/webp" and data[8:12] != b"WEBP":
+                continue
+            return content_type
+    return None
+
+def require_photo_bucket():
+    """The GridFS bucket, or a 503 when the storage backend runs without MongoDB"""
+    if photo_bucket is None:
+        raise HTTPException(status_code=503, detail=f"Photos need MongoDB, unavailable with the {STORAGE_BACKEND} backend")
+    return photo_bucket
+
+async def store_photo(data: bytes, background_tasks: Optional[BackgroundTasks] = None) -> str:
+    """Store raw image bytes in GridFS and return the new photo id.
+
+    The photo is pending until attach_photos records that a spot uses it.
+    Only the image structure is checked before answering. With background_tasks
+    the variants are rendered once the response is sent, otherwise on the first
+    request for one (see photo_variant_file).
+    """
+    bucket = require_photo_bucket()
+    if len(data) > PHOTO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Photo is too large")
+    content_type = sniff_image_type(data)
+    if content_type is None:
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(get_image_executor(), check_image, data)
+    except PhotoTooLarge:
+        raise HTTPException(status_code=413, detail="Photo has too many pixels")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Image could not be decoded")
+    content_hash = hashlib.sha256(data).hexdigest()
+    photo_id = str(uuid.uuid4())
+    await bucket.upload_from_stream_with_id(
+        photo_id, photo_id, data, metadata={"content_type": content_type, "sha256": content_hash, "pending": True}
+    )
+    if background_tasks is not None:
+        background_tasks.add_task(prerender_photo_variants, data, content_hash)
+    return photo_id
+
+async def render_photo_variants(data: bytes, content_hash: str):
+    """Generate the resized variants of a photo in the image process pool"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(get_image_executor(), render_variants, data, PHOTO_CACHE_DIR, content_hash)
+
+async def prerender_photo_variants(data: bytes, content_hash: str):
+    """Background task after an upload; a failure only means rendering on first request"""
+    try:
+        await render_photo_variants(data, content_hash)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not render variants of photo %s: %s", content_hash, e)
+
+async def photo_variant_file(grid_out, size: str) -> str:
+    """Path of a cached variant, regenerating it if the disk cache was lost"""
+    content_hash = (grid_out.metadata or {}).get("sha256")
+    data = None
+    if not content_hash:
+        data = await grid_out.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+    path = variant_path(PHOTO_CACHE_DIR, content_hash, size)
+    if not path.exists():
+        if data is None:
+            data = await grid_out.read()
+        await render_photo_variants(data, content_hash)
+    return str(path)
+
+async def store_photo_base64(photo_base64: str, background_tasks: Optional[BackgroundTasks] = None) -> str:
+    """Decode a legacy base64 photo (optionally a data: URI) into GridFS"""
+    if photo_base64.startswith("data:"):
+        photo_base64 = photo_base64.partition(",")[2]
+    try:
+        data = base64.b64decode(photo_base64, validate=True)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="photo_base64 is not valid base64")
+    return await store_photo(data, background_tasks)
+
+async def delete_photo(photo_id: Optional[str]):
+    """Remove a photo from GridFS and its variants from the disk cache.
+
+    A photo another spot still uses is kept: the API never lets two spots share
+    one, but seed.py does.
+    """
+    if not photo_id or photo_bucket is None:
+        return
+    if await db.mushroom_spots.find_one({"photo_id": photo_id}, {"_id": 1}):
+        return
+    photo = await db["photos.files"].find_one({"_id": photo_id}, {"metadata.sha256": 1})
+    try:
+        await photo_bucket.delete(photo_id)
+    except NoFile:
+        return
+    content_hash = ((photo or {}).get("metadata") or {}).get("sha256")
+    if content_hash:
+        # Identical uploads share variants; if another one is still stored,
+        # photo_variant_file renders them again on its next request
+        remove_variants(PHOTO_CACHE_DIR, content_hash)
+
+async def claim_photos(photo_ids: List[str]) -> set:
+    """Atomically reserve the photos that are still pending; returns the ids this call got"""
+    require_photo_bucket()
+    token = uuid.uuid4().hex
+    await db["photos.files"].update_many(
+        {"_id": {"$in": photo_ids}, "metadata.pending": True},
+        {"$set": {"metadata.pending": PHOTO_CLAIMED, "metadata.claim": token}},
+    )
+    return set(await db["photos.files"].distinct("_id", {"_id": {"$in": photo_ids}, "metadata.claim": token}))
+
+async def claim_photo(photo_id: str, spot_id: Optional[str] = None):
+    """Reserve a pending photo for a spot write, 400 if it is unknown or taken.
+
+    A spot updated with the photo_id it already has needs no claim.
+    """
+    if await claim_photos([photo_id]):
+        return
+    if spot_id and await db.mushroom_spots.find_one({"id": spot_id, "photo_id": photo_id}, {"_id": 1}):
+        return
+    raise HTTPException(status_code=400, detail=PHOTO_UNAVAILABLE)
+
+async def attach_photos(photo_ids: List[Optional[str]]):
+    """Clear the pending marker of photos a spot now references"""
+    photo_ids = [photo_id for photo_id in photo_ids if photo_id]
+    if not photo_ids or db is None:
+        return
+    await db["photos.files"].update_many(
+        {"_id": {"$in": photo_ids}, "metadata.pending": {"$exists": True}},
+        {"$unset": {"metadata.pending": "", "metadata.claim": ""}},
+    )
+
+async def release_photos(photo_ids: List[Optional[str]]):
+    """Make photos claimed by a spot write that failed pending again"""
+    photo_ids = [photo_id for photo_id in photo_ids if photo_id]
+    if not photo_ids or db is None:
+        return
+    await db["photos.files"].update_many(
+        {"_id": {"$in": photo_ids}, "metadata.pending": PHOTO_CLAIMED},
+        {"$set": {"metadata.pending": True}, "$unset": {"metadata.claim": ""}},
+    )
+
+async def resolve_spot_photo(
+    spot_dict: dict, background_tasks: Optional[BackgroundTasks] = None, spot_id: Optional[str] = None
+) -> dict:
+    """Replace photo_base64 in a create/update payload by a GridFS photo_id, or claim the given photo_id"""
+    photo_base64 = spot_dict.pop("photo_base64", None)
+    if photo_base64:
+        spot_dict["photo_id"] = await store_photo_base64(photo_base64, background_tasks)
+    elif spot_dict.get("photo_id"):
+        await claim_photo(spot_dict["photo_id"], spot_id)
+    return spot_dict
+
+def parse_byte_range(range_header: str, length: int) -> Optional[tuple]:
+    """(start, end) for a single "bytes=" range, None to serve the whole file"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            start, end = max(length - suffix, 0), length - 1
+            if suffix <= 0:
+                start = length
+        else:
+            start = int(first)
+            end = min(int(last), length - 1) if last else length - 1
+    except ValueError:
+        return None
+    if start >= length or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{length}"},
+        )
+    return start, end
+
+# Viewport clustering: below this zoom level spots are grouped into grid cells
+CLUSTER_MAX_ZOOM = 12
+CLUSTER_CELLS_PER_TILE = 4
+VIEWPORT_MAX_SPOTS = 500
+
+def parse_bbox(bbox: str) -> tuple:
+    """Parse "min_lon,min_lat,max_lon,max_lat" into a validated tuple"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+    return min_lon, min_lat, max_lon, max_lat
+
+# Keyset pagination: the next page token travels in this response header so
+# list bodies stay plain arrays for existing clients
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values: list) -> str:
+    """Opaque page token from the sort key of the last returned document"""
+    raw = json.dumps(values, default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """Values of a page token, which must have the given types, else 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types) or not all(
+        isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(values, types)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# Streaming export
+EXPORT_FIELDS = ["id", "latitude", "longitude", "mushroom_type", "notes", "photo_id", "timestamp", "created_by"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def export_rows(docs: List[dict], format: str) -> str:
+    """Serialize one cursor batch of spots as NDJSON lines or CSV rows"""
+    if format == "ndjson":
+        return "".join(
+            json.dumps(doc, default=lambda v: v.isoformat(), ensure_ascii=False) + "\n" for doc in docs
+        )
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    for doc in docs:
+        if isinstance(doc.get("timestamp"), datetime):
+            doc["timestamp"] = doc["timestamp"].isoformat()
+        writer.writerow(doc)
+    return buffer.getvalue()
+
+# Conditional GET: every write bumps a per-collection version stored in
+# collection_versions. Versions are cached in-process and re-read at most every
+# VERSION_REFRESH_SECONDS, so a matching If-None-Match is answered without
+# touching the queried collection.
+VERSION_REFRESH_SECONDS = 5.0
+collection_versions = {}  # name -> (version, updated_at, monotonic time fetched)
+
+async def get_collection_version(collection: str) -> tuple:
+    cached = collection_versions.get(collection)
+    if cached and time.monotonic() - cached[2] < VERSION_REFRESH_SECONDS:
+        return cached[0], cached[1]
+    stored = await storage.meta.get_version(collection)
+    version, updated_at = stored if stored else (0, datetime.utcnow())
+    collection_versions[collection] = (version, updated_at, time.monotonic())
+    return version, updated_at
+
+async def bump_collection_version(collection: str):
+    """Record a write to a collection so cached responses are revalidated"""
+    version, updated_at = await storage.meta.bump_version(collection)
+    collection_versions[collection] = (version, updated_at, time.monotonic())
+    return version
+
+def conditional_get(collection: str):
+    """Dependency emitting ETag / Last-Modified and answering 304 on a match"""
+    async def check(request: Request, response: Response):
+        version, updated_at = await get_collection_version(collection)
+        # The representation depends on the URL and, through content negotiation, on Accept
+        representation = f"{request.url}|{preferred_media_type(request.headers.get('accept'))}"
+        url_hash = hashlib.sha1(representation.encode()).hexdigest()[:16]
+        etag = f'"{collection}-{version}-{url_hash}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept",
+        }
+        if if_none_match_matches(request, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return check
+
+def if_none_match_matches(request: Request, etag: str) -> bool:
+    """Weak comparison: CompressionMiddleware sends W/ ETags on compressed bodies"""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (
+        if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    )
+
+class CatalogCache:
+    """In-process copy of mushroom_database, kept in sync by the catalog write routes.
+
+    The cache reloads when the collection version changes (a write from another
+    worker) or after ttl_seconds as a safety net.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.by_id = {}  # id -> MushroomInfo
+        self.summaries = {}  # id -> MushroomInfoSummary, dumped once for trusted_response
+        self.by_name = {}  # normalized common or latin name -> set of ids
+        self.sort_keys = []  # sorted (common_name, id), the listing order
+        self.search_index = SearchIndex()
+        self.prefix_index = PrefixIndex()
+        self.version = None
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure_fresh(self):
+        version, _ = await get_collection_version("mushroom_database")
+        expired = self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_seconds
+        if not expired and version == self.version:
+            self.hits += 1
+            return
+        self.misses += 1
+        async with self._lock:
+            if self.loaded_at is None or self.version != version or time.monotonic() - self.loaded_at > self.ttl_seconds:
+                await self.load(version)
+
+    async def load(self, version: Optional[int] = None):
+        if version is None:
+            version, _ = await get_collection_version("mushroom_database")
+        mushrooms = await storage.catalog.all()
+        self.by_id, self.summaries, self.by_name, self.sort_keys = {}, {}, {}, []
+        self.search_index = SearchIndex()
+        self.prefix_index = PrefixIndex()
+        for mushroom in mushrooms:
+            self._add(MushroomInfo(**mushroom))
+        self.sort_keys.sort()
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def _add(self, mushroom: MushroomInfo):
+        self.by_id[mushroom.id] = mushroom
+        self.summaries[mushroom.id] = MushroomInfoSummary(
+            **mushroom.model_dump(include={"id", "common_name", "latin_name", "edibility", "season", "photo_urls"}),
+            photo_count=len(mushroom.photos_base64),
+        ).model_dump()
+        for name in (mushroom.common_name, mushroom.latin_name):
+            self.by_name.setdefault(fold(name), set()).add(mushroom.id)
+        self.sort_keys.append((mushroom.common_name, mushroom.id))
+        self.search_index.add(
+            mushroom.id, mushroom.model_dump(include={"common_name", "latin_name", "characteristics", "habitat"})
+        )
+        self.prefix_index.add(mushroom.id, [mushroom.common_name, mushroom.latin_name])
+
+    def put(self, mushroom: MushroomInfo, version: int):
+        """Write-through after a create or update"""
+        if self._advance(version):
+            self._discard(mushroom.id)
+            self._add(mushroom)
+            self.sort_keys.sort()
+
+    def remove(self, mushroom_id: str, version: int):
+        """Write-through after a delete"""
+        if self._advance(version):
+            self._discard(mushroom_id)
+
+    def _advance(self, version: int) -> bool:
+        """Whether this worker's write is the only one since the cached version.
+
+        Otherwise another worker wrote in between: the cache is marked stale
+        so that the next ensure_fresh reloads it.
+        """
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+            return True
+        self.version = None
+        self.loaded_at = None
+        return False
+
+    def _discard(self, mushroom_id: str):
+        mushroom = self.by_id.pop(mushroom_id, None)
+        if mushroom is None:
+            return
+        del self.summaries[mushroom_id]
+        for name in (mushroom.common_name, mushroom.latin_name):
+            ids = self.by_name.get(fold(name), set())
+            ids.discard(mushroom_id)
+            if not ids:
+                self.by_name.pop(fold(name), None)
+        self.sort_keys.remove((mushroom.common_name, mushroom_id))
+        self.search_index.remove(mushroom_id)
+        self.prefix_index.remove(mushroom_id)
+
+    def get(self, mushroom_id: str) -> Optional[MushroomInfo]:
+        return self.by_id.get(mushroom_id)
+
+    def list_summaries(self, after: Optional[tuple], limit: int) -> tuple:
+        """A page of summaries in (common_name, id) order and whether more follow"""
+        start = bisect.bisect_right(self.sort_keys, after) if after else 0
+        page = [self.summaries[mushroom_id] for _, mushroom_id in self.sort_keys[start:start + limit + 1]]
+        return page[:limit], len(page) > limit
+
+    def search_summaries(self, query: str, offset: int, limit: int) -> tuple:
+        """A page of summaries ranked by relevance, exact name matches first"""
+        exact = sorted(self.by_name.get(fold(query), ()))
+        ranked = exact + [i for i, _ in self.search_index.search(query) if i not in exact]
+        page = [self.summaries[mushroom_id] for mushroom_id in ranked[offset:offset + limit + 1]]
+        return page[:limit], len(page) > limit
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version,
+            "age_seconds": None if self.loaded_at is None else round(time.monotonic() - self.loaded_at, 3),
+        }
+
+catalog_cache = CatalogCache(ttl_seconds=float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", "300")))
+
+# Delta sync: every write to a spot or catalog entry stamps it with the next
+# value of a global sequence, and deletes leave a tombstone with their own.
+SYNC_MAX_CHANGES = 1000
+
+async def next_seq(count: int = 1) -> int:
+    """Reserve count consecutive sequence values and return the first one"""
+    return await storage.meta.next_seq(count)
+
+class SeqReservations:
+    """Writes that hold sequence values but have not committed yet.
+
+    A value is reserved before the write that carries it commits, so seq N may
+    land after seq N + 1. /api/sync only returns changes up to safe_seq(): for
+    every write in flight, the highest value this process had handed out when
+    the write started, which is below whatever value the write gets. A client
+    syncing between the two commits is then never moved past N. Writes from
+    other worker processes are not tracked.
+    """
+
+    def __init__(self):
+        self.highest = 0
+        self.floors = []  # one per write in flight
+
+    @asynccontextmanager
+    async def reserve(self, count: int = 1):
+        """Reserve count consecutive values for a write; yields the first one"""
+        floor = self.highest
+        self.floors.append(floor)
+        try:
+            first = await next_seq(count)
+            self.highest = max(self.highest, first + count - 1)
+            yield first
+        finally:
+            self.floors.remove(floor)
+
+    def safe_seq(self) -> Optional[int]:
+        """Highest seq sync may return, None when no write is in flight"""
+        return min(self.floors) if self.floors else None
+
+seq_reservations = SeqReservations()
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Expected updated_seq from an If-Match header, None when any version is accepted"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a quoted updated_seq")
+
+def version_etag(updated_seq: int) -> str:
+    return f'"{updated_seq}"'
+
+def document_validators(request: Request, response: Response, updated_seq: int):
+    """ETag of a single document, the one its PUT route accepts as If-Match; 304 on a match"""
+    etag = version_etag(updated_seq)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if if_none_match_matches(request, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+async def record_tombstone(collection: str, doc_id: str):
+    async with seq_reservations.reserve() as seq:
+        await storage.meta.add_tombstone(collection, doc_id, seq)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Mushroom Finder API"}
 
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 200 once startup has warmed storage and the catalog, 503 before and while stopping"""
+    if not startup_timer.is_ready:
+        raise HTTPException(status_code=503, detail="Starting")
+    return {"status": "ready", "storage": STORAGE_BACKEND, "startup": startup_timer.report()}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = metrics_payload()
+    return Response(payload, media_type=content_type)
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
+    status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await storage.status.insert(status_obj.model_dump())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(request: Request, limit: int = Query(1000, ge=1, le=1000)):
+    """Most recent status checks that have not expired, newest first"""
+    # Rows are stored from validated StatusCheck models
+    return trusted_response(await storage.status.list(limit), request)
+
+@api_router.get("/status/summary", response_model=List[StatusClientSummary])
+async def get_status_summary(request: Request, client_name: Optional[str] = None):
+    """Check count, first and last check per client, from counters kept at write time"""
+    return trusted_response(await storage.status.summary(client_name), request)
 
 # Mushroom Spot Endpoints
 @api_router.post("/mushroom-spots", response_model=MushroomSpot)
-async def create_mushroom_spot(mushroom_spot: MushroomSpotCreate):
+async def create_mushroom_spot(mushroom_spot: MushroomSpotCreate, background_tasks: BackgroundTasks):
     """Create a new mushroom spot"""
     try:
-        spot_dict = mushroom_spot.dict()
-        spot_obj = MushroomSpot(**spot_dict)
-        result = await db.mushroom_spots.insert_one(spot_obj.dict())
+        spot_dict = await resolve_spot_photo(mushroom_spot.model_dump(), background_tasks)
+        try:
+            async with seq_reservations.reserve() as seq:
+                spot_obj = MushroomSpot(**spot_dict, updated_seq=seq)
+                await storage.spots.insert(spot_obj.model_dump())
+        except Exception:
+            await release_photos([spot_dict.get("photo_id")])
+            raise
+        await attach_photos([spot_obj.photo_id])
+        await bump_collection_version("mushroom_spots")
         return spot_obj
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@api_router.get("/mushroom-spots", response_model=List[MushroomSpot])
-async def get_mushroom_spots():
-    """Get all mushroom spots"""
+async def bulk_store_photos(creates: Dict[int, MushroomSpotCreate], results: List[BulkItemResult]) -> Dict[int, str]:
+    """Claim the referenced photos in one round trip and store the base64 ones a few at a time.
+
+    Returns index -> photo_id for the photos stored here; failures are recorded in results.
+    """
+    referenced = {}  # photo_id -> index of the first item using it
+    for index, spot_create in creates.items():
+        if spot_create.photo_id and not spot_create.photo_base64:
+            if spot_create.photo_id in referenced:
+                results[index].error = PHOTO_UNAVAILABLE
+            else:
+                referenced[spot_create.photo_id] = index
+    if referenced:
+        try:
+            claimed, unavailable = await claim_photos(list(referenced)), PHOTO_UNAVAILABLE
+        except HTTPException as e:
+            claimed, unavailable = set(), e.detail
+        for photo_id, index in referenced.items():
+            if photo_id not in claimed:
+                results[index].error = unavailable
+
+    semaphore = asyncio.Semaphore(BULK_PHOTO_CONCURRENCY)
+
+    async def upload(photo_base64: str) -> str:
+        async with semaphore:
+            return await store_photo_base64(photo_base64)
+
+    uploading = [index for index, spot_create in creates.items() if spot_create.photo_base64]
+    outcomes = await asyncio.gather(
+        *(upload(creates[index].photo_base64) for index in uploading), return_exceptions=True
+    )
+    uploaded = {}
+    for index, outcome in zip(uploading, outcomes):
+        if isinstance(outcome, HTTPException):
+            results[index].error = outcome.detail
+        elif isinstance(outcome, BaseException):
+            results[index].error = str(outcome)
+        else:
+            uploaded[index] = outcome
+    return uploaded
+
+@api_router.post(
+    "/mushroom-spots/bulk",
+    response_model=BulkCreateResult,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": {
+        "type": "array", "maxItems": BULK_MAX_ITEMS, "items": {"$ref": "#/components/schemas/MushroomSpotCreate"},
+    }}}}},
+)
+async def create_mushroom_spots_bulk(items: List[Dict[str, Any]]):
+    """Create many mushroom spots at once, reporting success or error per item"""
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} spots per request")
+
+    results = [BulkItemResult(index=i) for i in range(len(items))]
+    creates = {}  # index -> items that passed validation
+    for index, item in enumerate(items):
+        try:
+            creates[index] = MushroomSpotCreate.model_validate(item)
+        except ValidationError as e:
+            results[index].error = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'body'}: {err['msg']}" for err in e.errors()
+            )
+    uploaded = await bulk_store_photos(creates, results)  # index -> photo stored by this request
+
+    valid = []  # (index, document) pairs ready to insert
+    for index, spot_create in creates.items():
+        if results[index].error is None:
+            spot_dict = spot_create.model_dump(exclude={"photo_base64"})
+            if index in uploaded:
+                spot_dict["photo_id"] = uploaded[index]
+            valid.append((index, MushroomSpot(**spot_dict).model_dump()))
+
+    if valid:
+        async with seq_reservations.reserve(len(valid)) as first_seq:
+            for offset, (_, doc) in enumerate(valid):
+                doc["updated_seq"] = first_seq + offset
+            for start in range(0, len(valid), BULK_CHUNK_SIZE):
+                chunk = valid[start:start + BULK_CHUNK_SIZE]
+                try:
+                    failed = await storage.spots.insert_many([doc for _, doc in chunk])
+                except Exception as e:
+                    failed = {i: str(e) for i in range(len(chunk))}
+                for position, (index, doc) in enumerate(chunk):
+                    if position in failed:
+                        results[index].error = failed[position]
+                    else:
+                        results[index].id = doc["id"]
+        await attach_photos([doc["photo_id"] for index, doc in valid if results[index].id])
+        await release_photos([doc["photo_id"] for index, doc in valid if not results[index].id])
+        for index, doc in valid:
+            if not results[index].id and index in uploaded:
+                await delete_photo(doc["photo_id"])
+
+    inserted = sum(1 for r in results if r.id)
+    if inserted:
+        await bump_collection_version("mushroom_spots")
+    return BulkCreateResult(inserted=inserted, failed=len(results) - inserted, results=results)
+
+@api_router.get(
+    "/mushroom-spots",
+    response_model=Union[List[MushroomSpotSummary], ColumnarSpots],
+    dependencies=[Depends(conditional_get("mushroom_spots"))],
+)
+async def get_mushroom_spots(
+    request: Request,
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    layout: Literal["rows", "columnar"] = "rows",
+):
+    """Get mushroom spots, newest first, one page at a time (layout=columnar for parallel arrays)"""
+    after = None
+    if cursor:
+        timestamp, spot_id = decode_cursor(cursor, str, str)
+        try:
+            after = (naive_utc(datetime.fromisoformat(timestamp)), spot_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        spots = await db.mushroom_spots.find().sort("timestamp", -1).to_list(1000)
-        return [MushroomSpot(**spot) for spot in spots]
+        spots = await storage.spots.list_page(after, limit + 1)
+        if len(spots) > limit:
+            spots = spots[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor([spots[-1]["timestamp"], spots[-1]["id"]])
+        return trusted_response(columnar_spots(spots) if layout == "columnar" else spots, request, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/mushroom-spots/export")
+async def export_mushroom_spots(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    mushroom_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bbox: Optional[str] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    """Stream every matching spot without buffering the collection in memory"""
+    batches = storage.spots.export(
+        EXPORT_FIELDS, mushroom_type, since, until, parse_bbox(bbox) if bbox else None, batch_size
+    )
+
+    async def stream():
+        if format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+        async for batch in batches:
+            yield export_rows(batch, format)
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="mushroom-spots.{format}"'},
+    )
+
+@api_router.get("/mushroom-spots/viewport", response_model=ViewportSpots, dependencies=[Depends(conditional_get("mushroom_spots"))])
+async def get_viewport_mushroom_spots(
+    request: Request,
+    response: Response,
+    bbox: str,
+    zoom: int = CLUSTER_MAX_ZOOM + 1,
+    layout: Literal["rows", "columnar"] = "rows",
+):
+    """Get the spots inside the visible map area, clustered on a grid at low zoom"""
+    box = parse_bbox(bbox)
+    try:
+        if zoom > CLUSTER_MAX_ZOOM:
+            spots = await storage.spots.in_bbox(box, VIEWPORT_MAX_SPOTS + 1)
+            truncated = len(spots) > VIEWPORT_MAX_SPOTS
+            spots = spots[:VIEWPORT_MAX_SPOTS]
+            if layout == "columnar":
+                spots = columnar_spots(spots)
+            return trusted_response(
+                {"zoom": zoom, "clustered": False, "spots": spots, "truncated": truncated, "clusters": []},
+                request,
+                response,
+            )
+
+        # One map tile spans 360 / 2^zoom degrees of longitude
+        cell_size = 360 / (2 ** max(zoom, 0)) / CLUSTER_CELLS_PER_TILE
+        clusters = await storage.spots.clusters(box, cell_size)
+        return trusted_response({"zoom": zoom, "clustered": True, "spots": [], "clusters": clusters}, request, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/mushroom-spots/{spot_id}", response_model=MushroomSpot)
-async def get_mushroom_spot(spot_id: str):
-    """Get a specific mushroom spot by ID"""
+async def get_mushroom_spot(spot_id: str, request: Request, response: Response):
+    """Get a specific mushroom spot by ID; its ETag is the If-Match value for PUT"""
     try:
-        spot = await db.mushroom_spots.find_one({"id": spot_id})
+        spot = await storage.spots.get(spot_id)
         if not spot:
             raise HTTPException(status_code=404, detail="Mushroom spot not found")
-        return MushroomSpot(**spot)
+        document_validators(request, response, spot.get("updated_seq", 0))
+        return trusted_response(MushroomSpot(**spot).model_dump(), request, response)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.put("/mushroom-spots/{spot_id}", response_model=MushroomSpot)
-async def update_mushroom_spot(spot_id: str, updates: MushroomSpotUpdate):
-    """Update a mushroom spot"""
+async def update_mushroom_spot(
+    spot_id: str,
+    updates: MushroomSpotUpdate,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_match: Optional[str] = Header(None),
+):
+    """Update a mushroom spot atomically; If-Match: "<updated_seq>" guards against lost updates"""
+    expected_seq = parse_if_match(if_match)
     try:
-        # Get existing spot
-        existing_spot = await db.mushroom_spots.find_one({"id": spot_id})
-        if not existing_spot:
+        update_dict = {k: v for k, v in updates.model_dump().items() if v is not None}
+        update_dict = await resolve_spot_photo(update_dict, background_tasks, spot_id)
+        replaced_photo_id = None
+        try:
+            if not update_dict:
+                spot = await storage.spots.update(spot_id, {}, expected_seq)
+            else:
+                async with seq_reservations.reserve() as seq:
+                    update_dict["updated_seq"] = seq
+                    if "photo_id" in update_dict:
+                        # The previous photo_id is needed to clean up GridFS, so read the
+                        # document as it was and apply the update locally
+                        spot = await storage.spots.update(spot_id, update_dict, expected_seq, return_before=True)
+                        if spot:
+                            if spot.get("photo_id") != update_dict["photo_id"]:
+                                replaced_photo_id = spot.get("photo_id")
+                            spot.update(update_dict)
+                    else:
+                        spot = await storage.spots.update(spot_id, update_dict, expected_seq)
+        except Exception:
+            await release_photos([update_dict.get("photo_id")])
+            raise
+
+        if not spot:
+            if updates.photo_base64:
+                await delete_photo(update_dict.get("photo_id"))
+            else:
+                await release_photos([update_dict.get("photo_id")])
+            if expected_seq is not None and await storage.spots.exists(spot_id):
+                raise HTTPException(status_code=412, detail="Mushroom spot was modified by someone else")
             raise HTTPException(status_code=404, detail="Mushroom spot not found")
-        
-        # Apply updates
-        update_dict = {k: v for k, v in updates.dict().items() if v is not None}
+
+        await delete_photo(replaced_photo_id)
+        if "photo_id" in update_dict:
+            await attach_photos([update_dict["photo_id"]])
         if update_dict:
-            await db.mushroom_spots.update_one(
-                {"id": spot_id}, 
-                {"$set": update_dict}
-            )
-        
-        # Return updated spot
-        updated_spot = await db.mushroom_spots.find_one({"id": spot_id})
-        return MushroomSpot(**updated_spot)
+            await bump_collection_version("mushroom_spots")
+        response.headers["ETag"] = version_etag(spot["updated_seq"])
+        return MushroomSpot(**spot)
     
     except HTTPException:
         raise
@@ -173,97 +1157,264 @@ async def update_mushroom_spot(spot_id: str, updates: MushroomSpotUpdate):
 async def delete_mushroom_spot(spot_id: str):
     """Delete a mushroom spot"""
     try:
-        result = await db.mushroom_spots.delete_one({"id": spot_id})
-        if result.deleted_count == 0:
+        deleted = await storage.spots.delete(spot_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Mushroom spot not found")
+        await delete_photo(deleted.get("photo_id"))
+        await record_tombstone("mushroom_spots", spot_id)
+        await bump_collection_version("mushroom_spots")
         return {"message": "Mushroom spot deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/mushroom-spots/nearby/{latitude}/{longitude}")
-async def get_nearby_mushroom_spots(latitude: float, longitude: float, radius_km: float = 5.0):
-    """Get mushroom spots within a certain radius (in kilometers)"""
+@api_router.get(
+    "/mushroom-spots/nearby/{latitude}/{longitude}",
+    response_model=Union[List[MushroomSpotNearby], ColumnarNearbySpots],
+)
+async def get_nearby_mushroom_spots(
+    request: Request,
+    latitude: float,
+    longitude: float,
+    radius_km: float = Query(5.0, gt=0),
+    limit: int = Query(100, ge=1, le=1000),
+    layout: Literal["rows", "columnar"] = "rows",
+):
+    """Get at most limit mushroom spots within a certain radius (in kilometers), closest first"""
     try:
-        # Simple distance calculation (for more precision, use geospatial queries)
-        # This is a basic implementation - for production, you'd use MongoDB's geospatial features
-        all_spots = await db.mushroom_spots.find().to_list(1000)
-        nearby_spots = []
-        
-        for spot_data in all_spots:
-            spot = MushroomSpot(**spot_data)
-            # Simple distance calculation (Haversine formula would be more accurate)
-            lat_diff = abs(spot.latitude - latitude)
-            lon_diff = abs(spot.longitude - longitude)
-            # Rough approximation: 1 degree ≈ 111 km
-            distance_km = ((lat_diff ** 2 + lon_diff ** 2) ** 0.5) * 111
-            
-            if distance_km <= radius_km:
-                nearby_spots.append(spot)
-        
-        return nearby_spots
+        nearby_spots = await storage.spots.nearby(latitude, longitude, radius_km, limit)
+        if layout == "columnar":
+            nearby_spots = columnar_spots(nearby_spots, extra_columns=("distance_km",))
+        return trusted_response(nearby_spots, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Photo Endpoints
+@api_router.post("/photos", response_model=PhotoInfo)
+async def upload_photo(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """Upload a spot photo as multipart form data; variants are rendered after the response"""
+    data = await file.read(PHOTO_MAX_BYTES + 1)
+    photo_id = await store_photo(data, background_tasks)
+    return PhotoInfo(id=photo_id, content_type=sniff_image_type(data), length=len(data))
+
+@api_router.get("/photos/{photo_id}")
+async def get_photo(
+    photo_id: str,
+    size: Literal["thumbnail", "medium", "original"] = "original",
+    range_header: Optional[str] = Header(None, alias="Range"),
+):
+    """Stream a photo, honoring single byte-range requests"""
+    try:
+        grid_out = await require_photo_bucket().open_download_stream(photo_id)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    if size in VARIANT_SIZES:
+        try:
+            path = await photo_variant_file(grid_out, size)
+        except (OSError, ValueError):
+            raise HTTPException(status_code=500, detail="Photo variant could not be generated")
+        return FileResponse(
+            path,
+            media_type="image/jpeg",
+            headers={"Cache-Control": "public, max-age=31536000, immutable"},
+        )
+
+    length = grid_out.length
+    byte_range = parse_byte_range(range_header, length) if range_header else None
+    start, end = byte_range or (0, length - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        # Photo ids are never reused, so clients may cache them forever
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        grid_out.seek(start)
+
+    async def stream():
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(PHOTO_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        status_code=206 if byte_range else 200,
+        media_type=(grid_out.metadata or {}).get("content_type", "application/octet-stream"),
+        headers=headers,
+    )
+
 # Mushroom Database Endpoints
-@api_router.get("/mushrooms", response_model=List[MushroomInfo])
-async def get_mushrooms(search: Optional[str] = None):
-    """Get all mushrooms or search by name"""
+@api_router.get("/mushrooms", response_model=List[MushroomInfoSummary], dependencies=[Depends(conditional_get("mushroom_database"))])
+async def get_mushrooms(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Get all mushrooms ordered by common name, or search results ordered by relevance"""
     try:
-        if search:
-            # Case-insensitive search by common or latin name
-            mushrooms = await db.mushroom_database.find({
-                "$or": [
-                    {"common_name": {"$regex": search, "$options": "i"}},
-                    {"latin_name": {"$regex": search, "$options": "i"}}
-                ]
-            }).to_list(100)
-        else:
-            mushrooms = await db.mushroom_database.find().to_list(100)
-        
-        return [MushroomInfo(**mushroom) for mushroom in mushrooms]
+        await catalog_cache.ensure_fresh()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if search:
+        # Accent-insensitive, typo-tolerant search over names, characteristics and habitat;
+        # the cursor is an offset into the ranked results
+        offset = decode_cursor(cursor, int)[0] if cursor else 0
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        mushrooms, has_more = catalog_cache.search_summaries(search, offset, limit)
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor([offset + limit])
+        return trusted_response(mushrooms, request, response)
+
+    after = tuple(decode_cursor(cursor, str, str)) if cursor else None
+    mushrooms, has_more = catalog_cache.list_summaries(after, limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([mushrooms[-1]["common_name"], mushrooms[-1]["id"]])
+    return trusted_response(mushrooms, request, response)
+
+@api_router.get("/mushrooms/suggest", response_model=List[MushroomSuggestion])
+async def suggest_mushrooms(q: str, limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete mushroom names from the in-memory prefix index"""
+    try:
+        await catalog_cache.ensure_fresh()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return [
+        MushroomSuggestion(id=mushroom_id, name=name)
+        for mushroom_id, name in catalog_cache.prefix_index.suggest(q, limit)
+    ]
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin routes are closed unless PROFILE_ADMIN_TOKEN is set and sent as X-Admin-Token"""
+    if not PROFILE_ADMIN_TOKEN or x_admin_token != PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored request profiles, newest first"""
+    return profile_store.list()
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: Literal["html", "speedscope", "text"] = "html"):
+    """A stored request profile as an HTML call tree, a speedscope flame graph or text"""
+    rendered = await profile_store.render(profile_id, format)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(rendered, media_type=PROFILE_FORMATS[format])
+
+@api_router.get("/compression/stats")
+async def get_compression_stats():
+    """Bytes sent before and after compression, per route"""
+    return compression_stats.snapshot()
+
+@api_router.get("/mushrooms/cache/stats")
+async def get_catalog_cache_stats():
+    """Hit/miss counters of the in-process catalog cache"""
+    return catalog_cache.stats()
 
 @api_router.get("/mushrooms/{mushroom_id}", response_model=MushroomInfo)
-async def get_mushroom(mushroom_id: str):
-    """Get a specific mushroom by ID"""
-    mushroom = await db.mushroom_database.find_one({"id": mushroom_id})
+async def get_mushroom(mushroom_id: str, request: Request, response: Response):
+    """Get a specific mushroom by ID; its ETag is the If-Match value for PUT"""
+    await catalog_cache.ensure_fresh()
+    mushroom = catalog_cache.get(mushroom_id)
     if not mushroom:
         raise HTTPException(status_code=404, detail="Mushroom not found")
-    return MushroomInfo(**mushroom)
+    document_validators(request, response, mushroom.updated_seq)
+    return trusted_response(mushroom.model_dump(), request, response)
 
 @api_router.post("/mushrooms", response_model=MushroomInfo)
 async def create_mushroom(mushroom: MushroomInfoCreate):
     """Create a new mushroom entry (for admin use)"""
-    mushroom_dict = mushroom.dict()
-    mushroom_obj = MushroomInfo(**mushroom_dict)
-    await db.mushroom_database.insert_one(mushroom_obj.dict())
+    mushroom_dict = mushroom.model_dump()
+    async with seq_reservations.reserve() as seq:
+        mushroom_obj = MushroomInfo(**mushroom_dict, updated_seq=seq)
+        await storage.catalog.insert(mushroom_obj.model_dump())
+    version = await bump_collection_version("mushroom_database")
+    catalog_cache.put(mushroom_obj, version)
     return mushroom_obj
 
 @api_router.put("/mushrooms/{mushroom_id}", response_model=MushroomInfo)
-async def update_mushroom(mushroom_id: str, mushroom: MushroomInfoCreate):
-    """Update a mushroom entry (for admin use)"""
-    existing = await db.mushroom_database.find_one({"id": mushroom_id})
-    if not existing:
+async def update_mushroom(
+    mushroom_id: str,
+    mushroom: MushroomInfoCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    """Update a mushroom entry (for admin use); If-Match: "<updated_seq>" guards against lost updates"""
+    expected_seq = parse_if_match(if_match)
+    mushroom_dict = mushroom.model_dump()
+    async with seq_reservations.reserve() as seq:
+        mushroom_dict["updated_seq"] = seq
+        updated = await storage.catalog.update(mushroom_id, mushroom_dict, expected_seq)
+    if not updated:
+        if expected_seq is not None and await storage.catalog.exists(mushroom_id):
+            raise HTTPException(status_code=412, detail="Mushroom was modified by someone else")
         raise HTTPException(status_code=404, detail="Mushroom not found")
-    
-    mushroom_dict = mushroom.dict()
-    mushroom_dict["id"] = mushroom_id  # Preserve the ID
-    mushroom_obj = MushroomInfo(**mushroom_dict)
-    
-    await db.mushroom_database.replace_one({"id": mushroom_id}, mushroom_obj.dict())
+
+    mushroom_obj = MushroomInfo(**updated)
+    version = await bump_collection_version("mushroom_database")
+    catalog_cache.put(mushroom_obj, version)
+    response.headers["ETag"] = version_etag(mushroom_obj.updated_seq)
     return mushroom_obj
 
 @api_router.delete("/mushrooms/{mushroom_id}")
 async def delete_mushroom(mushroom_id: str):
     """Delete a mushroom entry (for admin use)"""
-    result = await db.mushroom_database.delete_one({"id": mushroom_id})
-    if result.deleted_count == 0:
+    if not await storage.catalog.delete(mushroom_id):
         raise HTTPException(status_code=404, detail="Mushroom not found")
+    await record_tombstone("mushroom_database", mushroom_id)
+    version = await bump_collection_version("mushroom_database")
+    catalog_cache.remove(mushroom_id, version)
     return {"message": "Mushroom deleted successfully", "id": mushroom_id}
 
+# Sync Endpoint
+@api_router.get("/sync", response_model=SyncChanges)
+async def sync_changes(since: int = 0, limit: int = Query(SYNC_MAX_CHANGES, ge=1, le=SYNC_MAX_CHANGES)):
+    """Spots, catalog entries and deletions with updated_seq > since, oldest change first"""
+    try:
+        sources = [
+            ("spots", storage.spots.changed_since),
+            ("mushrooms", storage.catalog.changed_since),
+            ("deleted", storage.meta.tombstones_since),
+        ]
+        # Changes past a write still in flight are held back until it commits
+        safe_seq = seq_reservations.safe_seq()
+        changes = []
+        for kind, changed_since in sources:
+            docs = await changed_since(since, limit + 1)
+            changes.extend(
+                (doc["updated_seq"], kind, doc) for doc in docs if safe_seq is None or doc["updated_seq"] <= safe_seq
+            )
+        # Sequence values are unique, so the first `limit` of the merged streams
+        # are exactly the next `limit` changes
+        changes.sort(key=lambda change: change[0])
+        page = changes[:limit]
+        result = SyncChanges(
+            since=since,
+            next_since=page[-1][0] if page else since,
+            has_more=len(changes) > limit,
+        )
+        for _, kind, doc in page:
+            if kind == "spots":
+                result.spots.append(MushroomSpot(**doc))
+            elif kind == "mushrooms":
+                result.mushrooms.append(MushroomInfo(**doc))
+            else:
+                result.deleted.append(Tombstone(**doc))
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -273,7 +1424,31 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
+)
+
+# Profile requests sent with X-Profile: <token>, plus a random sample
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    token=PROFILE_ADMIN_TOKEN,
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+    interval=float(os.environ.get("PROFILE_INTERVAL_SECONDS", "0.001")),
+)
+
+# Response compression; photos are already compressed and skipped by content type
+compression_stats = CompressionStats()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_BYTES", "1024")),
+    gzip_level=int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4")),
+    stats=compression_stats,
 )
+# Outermost, so latencies cover the whole stack and sizes are the bytes on the wire
+app.add_middleware(MetricsMiddleware)
+# Stops the cold-start clock on the first response (see startup.py)
+app.add_middleware(FirstByteMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -282,6 +1457,194 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+# Every index the app relies on, by collection. ensure_indexes() creates missing
+# ones, rebuilds those whose definition changed and reports undeclared ones.
+# Names are left to pymongo's default so they match indexes created earlier.
+INDEXES = {
+    "mushroom_spots": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("location", GEOSPHERE)]),
+        # Keyset pagination, matching the list sort order
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("mushroom_type", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("created_by", ASCENDING)]),
+        # Delta sync scans each source in updated_seq order
+        IndexModel([("updated_seq", ASCENDING)]),
+        # delete_photo checks that no other spot uses a photo
+        IndexModel([("photo_id", ASCENDING)], partialFilterExpression={"photo_id": {"$type": "string"}}),
+    ],
+    "mushroom_database": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("common_name", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("latin_name", ASCENDING)]),
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    "tombstones": [
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    # Expires status checks; also serves the newest-first listing
+    "status_checks": [
+        IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=STATUS_CHECK_TTL_SECONDS),
+    ],
+}
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def index_signature(index: dict) -> tuple:
+    """Comparable (keys, options) of an index document or IndexModel.document"""
+    keys = tuple((field, int(kind) if isinstance(kind, (int, float)) else kind) for field, kind in index["key"].items())
+    options = tuple((option, index.get(option) or None) for option in INDEX_OPTIONS)
+    return keys, options
+
+def ttl_only_change(current: dict, wanted: dict) -> bool:
+    """Whether two index definitions differ in a TTL both of them have, and nothing else"""
+    if "expireAfterSeconds" not in current or "expireAfterSeconds" not in wanted:
+        return False
+    return index_signature({**current, "expireAfterSeconds": wanted["expireAfterSeconds"]}) == index_signature(wanted)
+
+async def ensure_indexes():
+    """Create or reconcile the INDEXES registry and log any drift"""
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = {index["name"]: index async for index in collection.list_indexes()}
+        for model in models:
+            wanted = model.document
+            name = wanted["name"]
+            current = existing.pop(name, None)
+            if current is not None and index_signature(current) == index_signature(wanted):
+                continue
+            try:
+                if current is not None and ttl_only_change(current, wanted):
+                    # collMod changes the TTL in place, without rebuilding the index
+                    await db.command(
+                        "collMod", collection_name,
+                        index={"name": name, "expireAfterSeconds": wanted["expireAfterSeconds"]},
+                    )
+                    logger.info("Changed TTL of index %s.%s to %ss", collection_name, name, wanted["expireAfterSeconds"])
+                    continue
+                if current is not None:
+                    logger.warning("Index %s.%s drifted from its definition, rebuilding", collection_name, name)
+                    await collection.drop_index(name)
+                await collection.create_indexes([model])
+                logger.info("Created index %s.%s", collection_name, name)
+            except OperationFailure as e:
+                logger.error("Could not create index %s.%s: %s", collection_name, name, e)
+        existing.pop("_id_", None)
+        for name in existing:
+            logger.warning("Index %s.%s is not declared in INDEXES", collection_name, name)
+
+async def migrate_spot_locations():
+    """Backfill the GeoJSON location field on spots created before it existed"""
+    result = await db.mushroom_spots.update_many(
+        {"location": {"$exists": False}},
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}],
+    )
+    if result.modified_count:
+        logger.info("Backfilled location on %d mushroom spots", result.modified_count)
+        await bump_collection_version("mushroom_spots")
+
+async def migrate_spot_photos():
+    """Move base64 photos embedded in spot documents into GridFS"""
+    cursor = db.mushroom_spots.find(
+        {"photo_base64": {"$nin": [None, ""]}}, {"_id": 0, "id": 1, "photo_base64": 1}
+    )
+    moved = 0
+    async for spot in cursor:
+        try:
+            photo_id = await store_photo_base64(spot["photo_base64"])
+        except HTTPException as e:
+            logger.warning("Could not migrate photo of spot %s: %s", spot["id"], e.detail)
+            continue
+        await db.mushroom_spots.update_one(
+            {"id": spot["id"]},
+            {"$set": {"photo_id": photo_id, "updated_seq": await next_seq()}, "$unset": {"photo_base64": ""}},
+        )
+        await attach_photos([photo_id])
+        moved += 1
+    await db.mushroom_spots.update_many({"photo_base64": {"$in": [None, ""]}}, {"$unset": {"photo_base64": ""}})
+    if moved:
+        logger.info("Moved %d spot photos to GridFS", moved)
+        await bump_collection_version("mushroom_spots")
+
+async def sweep_pending_photos():
+    """Delete photos uploaded more than PHOTO_PENDING_TTL_SECONDS ago that no spot uses"""
+    cutoff = datetime.utcnow() - timedelta(seconds=PHOTO_PENDING_TTL_SECONDS)
+    pending = await db["photos.files"].distinct(
+        "_id", {"metadata.pending": {"$exists": True}, "uploadDate": {"$lt": cutoff}}
+    )
+    if not pending:
+        return
+    # A spot may have been written just before a crash skipped attach_photos
+    used = await db.mushroom_spots.distinct("photo_id", {"photo_id": {"$in": pending}})
+    await attach_photos(used)
+    orphans = set(pending) - set(used)
+    for photo_id in orphans:
+        await delete_photo(photo_id)
+    if orphans:
+        logger.info("Deleted %d photos never attached to a spot", len(orphans))
+
+async def migrate_status_clients():
+    """Build the per-client counters from the status checks stored before they existed"""
+    if await db.status_clients.estimated_document_count() or not await db.status_checks.estimated_document_count():
+        return
+    await db.status_checks.aggregate([
+        {"$group": {
+            "_id": "$client_name",
+            "count": {"$sum": 1},
+            "first_seen": {"$min": "$timestamp"},
+            "last_seen": {"$max": "$timestamp"},
+        }},
+        {"$merge": {"into": "status_clients", "whenMatched": "keepExisting"}},
+    ]).to_list(None)
+    logger.info("Built status_clients counters from existing status checks")
+
+async def migrate_updated_seq(collection):
+    """Give documents written before delta sync existed a unique updated_seq"""
+    missing = await collection.count_documents({"updated_seq": {"$exists": False}})
+    if not missing:
+        return
+    seq = await next_seq(missing)
+    cursor = collection.find({"updated_seq": {"$exists": False}}, {"_id": 1})
+    batch = []
+    async for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"], "updated_seq": {"$exists": False}}, {"$set": {"updated_seq": seq}}))
+        seq += 1
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+    logger.info("Assigned updated_seq to %d documents in %s", missing, collection.name)
+
+async def startup_db_client():
+    """Warm everything the first request needs before the server accepts it"""
+    with startup_timer.phase("storage"):
+        await storage.startup()
+    if STORAGE_BACKEND == "mongo":
+        # Opens the pool's first connection (DNS, TLS, auth) now, not on the first request
+        with startup_timer.phase("mongo_ping"):
+            await client.admin.command("ping")
+        with startup_timer.phase("indexes"):
+            await ensure_indexes()
+        with startup_timer.phase("migrations"):
+            await migrate_spot_locations()
+            await migrate_updated_seq(db.mushroom_spots)
+            await migrate_updated_seq(db.mushroom_database)
+            await migrate_spot_photos()
+            await sweep_pending_photos()
+            await migrate_status_clients()
+    with startup_timer.phase("catalog"):
+        await catalog_cache.load()
+    for phase, seconds in startup_timer.phases.items():
+        STARTUP_PHASE_SECONDS.labels(phase).set(seconds)
+    COLD_START_SECONDS.set_function(lambda: startup_timer.first_byte_seconds or 0.0)
+    startup_timer.ready()
+
 async def shutdown_db_client():
-    client.close()
+    startup_timer.stopping()
+    await storage.close()
+    if client is not None:
+        client.close()
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
+
+startup_timer.mark("app")
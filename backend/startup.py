@@ -0,0 +1,115 @@
+"""Cold-start instrumentation for server.py.
+
+server.py imports this module first, so the measurement covers everything
+after the interpreter itself came up. The startup is split in consecutive
+phases:
+
+- interpreter: from process start to the first import (read from /proc, so
+  only on Linux)
+- imports: server.py's imports
+- app: building the models, routes and middleware
+- one phase per step of the lifespan hook (storage, Mongo ping, indexes,
+  migrations, catalog)
+
+The clock stops when the first response starts, which gives the cold start
+to first byte. Nothing here imports more than the standard library.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def process_started_at() -> Optional[float]:
+    """Wall-clock time this process started, None where /proc is not available"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Fields after the parenthesized command name; starttime is field 22 overall
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            seconds_since_boot = float(uptime.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - seconds_since_boot + start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupTimer:
+    """Durations of the consecutive startup phases, in seconds"""
+
+    def __init__(self):
+        self.loaded_at = time.time()
+        self.started_at = process_started_at() or self.loaded_at
+        self.phases: Dict[str, float] = {}
+        if self.started_at < self.loaded_at:
+            self.phases["interpreter"] = self.loaded_at - self.started_at
+        self._last = time.perf_counter()
+        self.ready_at: Optional[float] = None
+        self.first_byte_at: Optional[float] = None
+
+    def mark(self, phase: str):
+        """End a phase that started where the previous one ended"""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    @contextmanager
+    def phase(self, phase: str):
+        """Time a block as a phase (anything since the previous phase is left out)"""
+        self._last = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(phase)
+
+    def ready(self):
+        self.ready_at = time.time()
+        logger.info(
+            "Ready in %.3fs (%s)", self.ready_at - self.started_at,
+            ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.phases.items()),
+        )
+
+    def stopping(self):
+        self.ready_at = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready_at is not None
+
+    @property
+    def first_byte_seconds(self) -> Optional[float]:
+        """Cold start to first byte: process start to the first response"""
+        return None if self.first_byte_at is None else self.first_byte_at - self.started_at
+
+    def report(self) -> dict:
+        return {
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            "ready_seconds": None if self.ready_at is None else round(self.ready_at - self.started_at, 6),
+            "first_byte_seconds": None if self.first_byte_at is None else round(self.first_byte_seconds, 6),
+        }
+
+
+startup_timer = StartupTimer()
+
+
+class FirstByteMiddleware:
+    """Pure ASGI middleware recording when the first response starts"""
+
+    def __init__(self, app, timer: StartupTimer = startup_timer):
+        self.app = app
+        self.timer = timer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.timer.first_byte_at is not None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.timer.first_byte_at is None:
+                self.timer.first_byte_at = time.time()
+                logger.info("Cold start to first byte: %.3fs", self.timer.first_byte_seconds)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
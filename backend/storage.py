@@ -0,0 +1,1242 @@
+"""Storage backends for spots, the mushroom catalog and status checks.
+
+Routes talk to a Storage, which bundles four repositories:
+
+- spots: mushroom_spots, including the geo queries
+- catalog: mushroom_database
+- status: status_checks, kept for status_ttl_seconds only, with counters per client
+- meta: the change sequence, collection versions and tombstones
+
+Three backends implement them:
+
+- mongo: Motor, the production backend
+- memory: dicts, for tests and for measuring the API layer on its own
+- sqlite: one file, with an R*Tree index for geo queries
+
+Photos are not part of this: they live in GridFS, so they are only available
+with the mongo backend (the photo routes answer 503 otherwise).
+
+Every repository method returns plain dicts shaped like the Mongo documents
+minus _id and the derived location field. Spot list queries return rows in
+the MushroomSpotSummary shape. Calls are timed into the
+storage_operation_duration_seconds histogram, so storage time can be told
+apart from the time spent in the API layer.
+"""
+import asyncio
+import bisect
+import heapq
+import inspect
+import json
+import itertools
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from metrics import STORAGE_OPERATIONS
+
+# Mean Earth radius MongoDB uses for spherical distances
+EARTH_RADIUS_KM = 6378.1
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+BBox = Tuple[float, float, float, float]  # min_lon, min_lat, max_lon, max_lat
+
+
+def spot_location(latitude: float, longitude: float) -> dict:
+    """GeoJSON point used by the 2dsphere index (longitude first)"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def spot_summary(doc: dict) -> dict:
+    """A stored spot in the MushroomSpotSummary shape (what SPOT_SUMMARY_PROJECTION yields)"""
+    return {
+        "id": doc["id"],
+        "latitude": doc["latitude"],
+        "longitude": doc["longitude"],
+        "mushroom_type": doc["mushroom_type"],
+        "notes": "" if doc.get("notes") is None else doc["notes"],
+        "timestamp": doc["timestamp"],
+        "created_by": "Utilisateur" if doc.get("created_by") is None else doc["created_by"],
+        "photo_id": doc.get("photo_id"),
+        "has_photo": doc.get("photo_id") is not None,
+    }
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; bring query bounds to the same form"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude: float, longitude: float, radius_km: float) -> BBox:
+    """A lon/lat box containing every point within radius_km"""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return -180.0, min_lat, 180.0, max_lat
+    dlon = dlat / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if dlon >= 180:
+        return -180.0, min_lat, 180.0, max_lat
+    # Boxes crossing the antimeridian are widened to every longitude
+    if longitude - dlon < -180 or longitude + dlon > 180:
+        return -180.0, min_lat, 180.0, max_lat
+    return longitude - dlon, min_lat, longitude + dlon, max_lat
+
+
+def in_box(doc: dict, bbox: BBox) -> bool:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lat <= doc["latitude"] <= max_lat and min_lon <= doc["longitude"] <= max_lon
+
+
+def grid_clusters(points, cell_size: float) -> List[dict]:
+    """Group (latitude, longitude) points into grid cells with their centroid"""
+    cells: Dict[Tuple[int, int], List[float]] = {}
+    for latitude, longitude in points:
+        cell = cells.setdefault((math.floor(longitude / cell_size), math.floor(latitude / cell_size)), [0.0, 0.0, 0])
+        cell[0] += latitude
+        cell[1] += longitude
+        cell[2] += 1
+    return [
+        {"latitude": lat_sum / count, "longitude": lon_sum / count, "count": count}
+        for lat_sum, lon_sum, count in cells.values()
+    ]
+
+
+# Interface
+
+class SpotRepository:
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]) -> Dict[int, str]:
+        """Insert what can be inserted; returns {position in docs: error} for the rest"""
+        raise NotImplementedError
+
+    async def get(self, spot_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def exists(self, spot_id: str) -> bool:
+        raise NotImplementedError
+
+    async def list_page(self, after: Optional[Tuple[datetime, str]], limit: int) -> List[dict]:
+        """Summaries newest first, (timestamp, id) descending, strictly after `after`"""
+        raise NotImplementedError
+
+    async def in_bbox(self, bbox: BBox, limit: int) -> List[dict]:
+        """Summaries of the newest spots inside the box"""
+        raise NotImplementedError
+
+    async def clusters(self, bbox: BBox, cell_size: float) -> List[dict]:
+        """Centroid and count of the spots inside the box, per grid cell of cell_size degrees"""
+        raise NotImplementedError
+
+    async def nearby(self, latitude: float, longitude: float, radius_km: float, limit: int) -> List[dict]:
+        """Summaries with distance_km, closest first"""
+        raise NotImplementedError
+
+    def export(self, fields: List[str], mushroom_type: Optional[str], since: Optional[datetime],
+               until: Optional[datetime], bbox: Optional[BBox], batch_size: int) -> AsyncIterator[List[dict]]:
+        """Matching spots newest first, in batches of batch_size"""
+        raise NotImplementedError
+
+    async def update(self, spot_id: str, fields: dict, expected_seq: Optional[int],
+                     return_before: bool = False) -> Optional[dict]:
+        """Set fields if the spot exists (at expected_seq, when given); the spot before or after"""
+        raise NotImplementedError
+
+    async def delete(self, spot_id: str) -> Optional[dict]:
+        """Remove a spot and return it"""
+        raise NotImplementedError
+
+    async def changed_since(self, seq: int, limit: int) -> List[dict]:
+        """Spots with updated_seq > seq, in updated_seq order"""
+        raise NotImplementedError
+
+
+class CatalogRepository:
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]) -> Dict[int, str]:
+        raise NotImplementedError
+
+    async def all(self) -> List[dict]:
+        raise NotImplementedError
+
+    async def exists(self, mushroom_id: str) -> bool:
+        raise NotImplementedError
+
+    async def update(self, mushroom_id: str, fields: dict, expected_seq: Optional[int]) -> Optional[dict]:
+        """Set fields if the entry exists (at expected_seq, when given); the entry after"""
+        raise NotImplementedError
+
+    async def delete(self, mushroom_id: str) -> bool:
+        raise NotImplementedError
+
+    async def changed_since(self, seq: int, limit: int) -> List[dict]:
+        raise NotImplementedError
+
+
+class StatusRepository:
+    """Status checks expire after ttl_seconds; per-client counters are kept for good"""
+
+    async def insert(self, doc: dict):
+        """Store a check and count it for its client"""
+        raise NotImplementedError
+
+    async def list(self, limit: int) -> List[dict]:
+        """Checks that have not expired, newest first"""
+        raise NotImplementedError
+
+    async def summary(self, client_name: Optional[str] = None) -> List[dict]:
+        """client_name, count, first_seen and last_seen for every client, or just one"""
+        raise NotImplementedError
+
+
+class MetaRepository:
+    async def next_seq(self, count: int = 1) -> int:
+        """Reserve count consecutive sequence values and return the first one"""
+        raise NotImplementedError
+
+    async def get_version(self, collection: str) -> Optional[Tuple[int, datetime]]:
+        raise NotImplementedError
+
+    async def bump_version(self, collection: str) -> Tuple[int, datetime]:
+        raise NotImplementedError
+
+    async def add_tombstone(self, collection: str, doc_id: str, seq: int):
+        raise NotImplementedError
+
+    async def tombstones_since(self, seq: int, limit: int) -> List[dict]:
+        raise NotImplementedError
+
+
+class TimedRepository:
+    """Proxy observing the duration of every awaited repository call"""
+
+    def __init__(self, repository, backend: str, name: str):
+        self._repository = repository
+        self._backend = backend
+        self._name = name
+
+    def __getattr__(self, attr):
+        method = getattr(self._repository, attr)
+        if not inspect.iscoroutinefunction(method):
+            return method
+        histogram = STORAGE_OPERATIONS.labels(self._backend, self._name, attr)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return timed
+
+
+class Storage:
+    def __init__(self, name: str, spots, catalog, status, meta):
+        self.name = name
+        self.spots = TimedRepository(spots, name, "spots")
+        self.catalog = TimedRepository(catalog, name, "catalog")
+        self.status = TimedRepository(status, name, "status")
+        self.meta = TimedRepository(meta, name, "meta")
+
+    async def startup(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+# MongoDB (Motor)
+
+# Projection used by spot list queries so photos never leave Mongo. Optional
+# fields get their model defaults here so each row already has the exact
+# MushroomSpotSummary shape and can skip validation (see trusted_response).
+SPOT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "latitude": 1,
+    "longitude": 1,
+    "mushroom_type": 1,
+    "notes": {"$ifNull": ["$notes", ""]},
+    "timestamp": 1,
+    "created_by": {"$ifNull": ["$created_by", "Utilisateur"]},
+    "photo_id": {"$ifNull": ["$photo_id", None]},
+    "has_photo": {"$gt": [{"$ifNull": ["$photo_id", None]}, None]},
+}
+SPOT_PROJECTION = {"_id": 0, "location": 0}
+
+
+def bbox_filter(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> dict:
+    """$geoWithin filter on the 2dsphere-indexed location field"""
+    ranges = {
+        "latitude": {"$gte": min_lat, "$lte": max_lat},
+        "longitude": {"$gte": min_lon, "$lte": max_lon},
+    }
+    width = max_lon - min_lon
+    if width >= 360 or min_lat <= -90 or max_lat >= 90:
+        # Both ends of a full parallel are the same point and every vertex of
+        # an edge on a pole collapses into one; MongoDB rejects such polygons
+        # as having duplicate vertices, so world views use the ranges alone
+        return ranges
+    # Polygon edges are geodesics, so the east-west edges are densified to
+    # follow their parallels; the range checks make the edges exact.
+    steps = 32
+    bottom = [[min_lon + width * i / steps, min_lat] for i in range(steps + 1)]
+    top = [[max_lon - width * i / steps, max_lat] for i in range(steps + 1)]
+    polygon = {
+        "type": "Polygon",
+        "coordinates": [bottom + top + [bottom[0]]],
+        # Counter-clockwise winding lets the box span more than a hemisphere
+        "crs": {"type": "name", "properties": {"name": "urn:x-mongodb:crs:strictwinding:EPSG:4326"}},
+    }
+    return {"location": {"$geoWithin": {"$geometry": polygon}}, **ranges}
+
+
+def after_cursor(fields: List[str], values: list, direction: int) -> dict:
+    """Filter selecting documents strictly after (fields...) == values in sort order"""
+    op = "$gt" if direction == ASCENDING else "$lt"
+    primary, secondary = fields
+    return {"$or": [
+        {primary: {op: values[0]}},
+        {primary: values[0], secondary: {op: values[1]}},
+    ]}
+
+
+def bulk_failures(error: BulkWriteError) -> Dict[int, str]:
+    return {err["index"]: err.get("errmsg", "Write failed") for err in error.details.get("writeErrors", [])}
+
+
+class MotorSpotRepository(SpotRepository):
+    def __init__(self, db):
+        self.collection = db.mushroom_spots
+
+    async def insert(self, doc):
+        await self.collection.insert_one({**doc, "location": spot_location(doc["latitude"], doc["longitude"])})
+
+    async def insert_many(self, docs):
+        try:
+            await self.collection.insert_many(
+                [{**doc, "location": spot_location(doc["latitude"], doc["longitude"])} for doc in docs],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            return bulk_failures(e)
+        return {}
+
+    async def get(self, spot_id):
+        return await self.collection.find_one({"id": spot_id}, SPOT_PROJECTION)
+
+    async def exists(self, spot_id):
+        return await self.collection.find_one({"id": spot_id}, {"_id": 1}) is not None
+
+    async def list_page(self, after, limit):
+        query = after_cursor(["timestamp", "id"], list(after), DESCENDING) if after else {}
+        return await self.collection.find(query, SPOT_SUMMARY_PROJECTION).sort(
+            [("timestamp", DESCENDING), ("id", DESCENDING)]
+        ).limit(limit).to_list(limit)
+
+    async def in_bbox(self, bbox, limit):
+        return await self.collection.aggregate([
+            {"$match": bbox_filter(*bbox)},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": limit},
+            {"$project": SPOT_SUMMARY_PROJECTION},
+        ]).to_list(None)
+
+    async def clusters(self, bbox, cell_size):
+        return await self.collection.aggregate([
+            {"$match": bbox_filter(*bbox)},
+            {"$group": {
+                "_id": {
+                    "x": {"$floor": {"$divide": ["$longitude", cell_size]}},
+                    "y": {"$floor": {"$divide": ["$latitude", cell_size]}},
+                },
+                "latitude": {"$avg": "$latitude"},
+                "longitude": {"$avg": "$longitude"},
+                "count": {"$sum": 1},
+            }},
+            {"$project": {"_id": 0}},
+        ]).to_list(None)
+
+    async def nearby(self, latitude, longitude, radius_km, limit):
+        return await self.collection.aggregate([
+            {
+                "$geoNear": {
+                    "near": spot_location(latitude, longitude),
+                    "distanceField": "distance_km",
+                    "maxDistance": radius_km * 1000,
+                    "distanceMultiplier": 0.001,  # meters -> kilometers
+                    "spherical": True,
+                }
+            },
+            {"$limit": limit},
+            {"$project": {**SPOT_SUMMARY_PROJECTION, "distance_km": 1}},
+        ]).to_list(None)
+
+    async def export(self, fields, mushroom_type, since, until, bbox, batch_size):
+        query = {}
+        if mushroom_type:
+            query["mushroom_type"] = mushroom_type
+        if since or until:
+            query["timestamp"] = {}
+            if since:
+                query["timestamp"]["$gte"] = since
+            if until:
+                query["timestamp"]["$lt"] = until
+        if bbox:
+            query.update(bbox_filter(*bbox))
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        cursor = self.collection.find(query, projection).sort("timestamp", DESCENDING).batch_size(batch_size)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def update(self, spot_id, fields, expected_seq, return_before=False):
+        spot_filter = {"id": spot_id}
+        if expected_seq is not None:
+            spot_filter["updated_seq"] = expected_seq
+        if not fields:
+            return await self.collection.find_one(spot_filter, SPOT_PROJECTION)
+        return await self.collection.find_one_and_update(
+            spot_filter, {"$set": fields}, SPOT_PROJECTION,
+            return_document=ReturnDocument.BEFORE if return_before else ReturnDocument.AFTER,
+        )
+
+    async def delete(self, spot_id):
+        return await self.collection.find_one_and_delete({"id": spot_id}, SPOT_PROJECTION)
+
+    async def changed_since(self, seq, limit):
+        return await self.collection.find({"updated_seq": {"$gt": seq}}, SPOT_PROJECTION).sort(
+            "updated_seq", ASCENDING
+        ).limit(limit).to_list(limit)
+
+
+class MotorCatalogRepository(CatalogRepository):
+    def __init__(self, db):
+        self.collection = db.mushroom_database
+
+    async def insert(self, doc):
+        await self.collection.insert_one(dict(doc))
+
+    async def insert_many(self, docs):
+        try:
+            await self.collection.insert_many([dict(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            return bulk_failures(e)
+        return {}
+
+    async def all(self):
+        return await self.collection.find({}, {"_id": 0}).to_list(None)
+
+    async def exists(self, mushroom_id):
+        return await self.collection.find_one({"id": mushroom_id}, {"_id": 1}) is not None
+
+    async def update(self, mushroom_id, fields, expected_seq):
+        mushroom_filter = {"id": mushroom_id}
+        if expected_seq is not None:
+            mushroom_filter["updated_seq"] = expected_seq
+        return await self.collection.find_one_and_update(
+            mushroom_filter, {"$set": fields}, {"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, mushroom_id):
+        result = await self.collection.delete_one({"id": mushroom_id})
+        return result.deleted_count > 0
+
+    async def changed_since(self, seq, limit):
+        return await self.collection.find({"updated_seq": {"$gt": seq}}, {"_id": 0}).sort(
+            "updated_seq", ASCENDING
+        ).limit(limit).to_list(limit)
+
+
+class MotorStatusRepository(StatusRepository):
+    """The TTL index expiring status_checks is declared in server.INDEXES.
+
+    MongoDB's TTL monitor only runs about once a minute, so list also filters
+    on the cutoff itself.
+    """
+
+    def __init__(self, db, ttl_seconds: int):
+        self.collection = db.status_checks
+        self.clients = db.status_clients
+        self.ttl_seconds = ttl_seconds
+
+    async def insert(self, doc):
+        await self.collection.insert_one(dict(doc))
+        await self.clients.update_one(
+            {"_id": doc["client_name"]},
+            {
+                "$inc": {"count": 1},
+                "$min": {"first_seen": doc["timestamp"]},
+                "$max": {"last_seen": doc["timestamp"]},
+            },
+            upsert=True,
+        )
+
+    async def list(self, limit):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        cursor = self.collection.find({"timestamp": {"$gte": cutoff}}, {"_id": 0})
+        return await cursor.sort("timestamp", DESCENDING).limit(limit).to_list(limit)
+
+    async def summary(self, client_name=None):
+        query = {} if client_name is None else {"_id": client_name}
+        return [
+            {"client_name": doc.pop("_id"), **doc}
+            async for doc in self.clients.find(query).sort("_id", ASCENDING)
+        ]
+
+
+class MotorMetaRepository(MetaRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def next_seq(self, count=1):
+        doc = await self.db.counters.find_one_and_update(
+            {"_id": "updated_seq"},
+            {"$inc": {"value": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["value"] - count + 1
+
+    async def get_version(self, collection):
+        doc = await self.db.collection_versions.find_one({"_id": collection})
+        return (doc["version"], doc["updated_at"]) if doc else None
+
+    async def bump_version(self, collection):
+        doc = await self.db.collection_versions.find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"], doc["updated_at"]
+
+    async def add_tombstone(self, collection, doc_id, seq):
+        await self.db.tombstones.insert_one({
+            "collection": collection,
+            "id": doc_id,
+            "updated_seq": seq,
+            "deleted_at": datetime.utcnow(),
+        })
+
+    async def tombstones_since(self, seq, limit):
+        return await self.db.tombstones.find({"updated_seq": {"$gt": seq}}, {"_id": 0, "deleted_at": 0}).sort(
+            "updated_seq", ASCENDING
+        ).limit(limit).to_list(limit)
+
+
+class MotorStorage(Storage):
+    """Indexes, migrations and closing the client stay with server.py, which owns the Motor client"""
+
+    def __init__(self, db, status_ttl_seconds: int):
+        super().__init__(
+            "mongo", MotorSpotRepository(db), MotorCatalogRepository(db), MotorStatusRepository(db, status_ttl_seconds),
+            MotorMetaRepository(db),
+        )
+
+
+# In memory
+
+# Spots are bucketed by grid cells of this many degrees for geo queries
+MEMORY_GRID_DEGREES = 0.25
+
+
+class MemorySpotRepository(SpotRepository):
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        self.order: List[Tuple[datetime, str]] = []  # sorted (timestamp, id)
+        self.grid: Dict[Tuple[int, int], set] = {}
+
+    @staticmethod
+    def _cell(latitude, longitude):
+        return math.floor(latitude / MEMORY_GRID_DEGREES), math.floor(longitude / MEMORY_GRID_DEGREES)
+
+    def _add(self, doc):
+        doc = dict(doc)
+        doc.pop("location", None)
+        self.docs[doc["id"]] = doc
+        bisect.insort(self.order, (doc["timestamp"], doc["id"]))
+        self.grid.setdefault(self._cell(doc["latitude"], doc["longitude"]), set()).add(doc["id"])
+
+    def _candidates(self, bbox):
+        """Spots in the grid cells overlapping the box"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        (row0, col0), (row1, col1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.grid):
+            cells = [ids for (row, col), ids in self.grid.items() if row0 <= row <= row1 and col0 <= col <= col1]
+        else:
+            cells = [self.grid.get((row, col), ()) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+        for ids in cells:
+            for spot_id in ids:
+                yield self.docs[spot_id]
+
+    async def insert(self, doc):
+        if doc["id"] in self.docs:
+            raise ValueError(f"Duplicate spot id {doc['id']}")
+        self._add(doc)
+
+    async def insert_many(self, docs):
+        failures = {}
+        for position, doc in enumerate(docs):
+            if doc["id"] in self.docs:
+                failures[position] = f"Duplicate spot id {doc['id']}"
+            else:
+                self._add(doc)
+        return failures
+
+    async def get(self, spot_id):
+        doc = self.docs.get(spot_id)
+        return dict(doc) if doc else None
+
+    async def exists(self, spot_id):
+        return spot_id in self.docs
+
+    async def list_page(self, after, limit):
+        end = bisect.bisect_left(self.order, tuple(after)) if after else len(self.order)
+        keys = self.order[max(end - limit, 0):end]
+        return [spot_summary(self.docs[spot_id]) for _, spot_id in reversed(keys)]
+
+    async def in_bbox(self, bbox, limit):
+        matching = (doc for doc in self._candidates(bbox) if in_box(doc, bbox))
+        return [spot_summary(doc) for doc in heapq.nlargest(limit, matching, key=lambda doc: doc["timestamp"])]
+
+    async def clusters(self, bbox, cell_size):
+        return grid_clusters(
+            ((doc["latitude"], doc["longitude"]) for doc in self._candidates(bbox) if in_box(doc, bbox)), cell_size
+        )
+
+    async def nearby(self, latitude, longitude, radius_km, limit):
+        found = []
+        for doc in self._candidates(radius_bbox(latitude, longitude, radius_km)):
+            distance = distance_km(latitude, longitude, doc["latitude"], doc["longitude"])
+            if distance <= radius_km:
+                found.append((distance, doc))
+        return [
+            {**spot_summary(doc), "distance_km": distance}
+            for distance, doc in heapq.nsmallest(limit, found, key=lambda item: item[0])
+        ]
+
+    async def export(self, fields, mushroom_type, since, until, bbox, batch_size):
+        since, until = naive_utc(since), naive_utc(until)
+        batch = []
+        for _, spot_id in reversed(list(self.order)):
+            doc = self.docs.get(spot_id)
+            if doc is None or (mushroom_type and doc["mushroom_type"] != mushroom_type):
+                continue
+            if (since and doc["timestamp"] < since) or (until and doc["timestamp"] >= until):
+                continue
+            if bbox and not in_box(doc, bbox):
+                continue
+            batch.append({field: doc.get(field) for field in fields})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def update(self, spot_id, fields, expected_seq, return_before=False):
+        doc = self.docs.get(spot_id)
+        if doc is None or (expected_seq is not None and doc.get("updated_seq") != expected_seq):
+            return None
+        before = dict(doc)
+        doc.update(fields)
+        return before if return_before else dict(doc)
+
+    async def delete(self, spot_id):
+        doc = self.docs.pop(spot_id, None)
+        if doc is None:
+            return None
+        key = (doc["timestamp"], spot_id)
+        del self.order[bisect.bisect_left(self.order, key)]
+        self.grid[self._cell(doc["latitude"], doc["longitude"])].discard(spot_id)
+        return doc
+
+    async def changed_since(self, seq, limit):
+        changed = (doc for doc in self.docs.values() if doc.get("updated_seq", 0) > seq)
+        return [dict(doc) for doc in heapq.nsmallest(limit, changed, key=lambda doc: doc["updated_seq"])]
+
+
+class MemoryCatalogRepository(CatalogRepository):
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+
+    async def insert(self, doc):
+        if doc["id"] in self.docs:
+            raise ValueError(f"Duplicate mushroom id {doc['id']}")
+        self.docs[doc["id"]] = dict(doc)
+
+    async def insert_many(self, docs):
+        failures = {}
+        for position, doc in enumerate(docs):
+            if doc["id"] in self.docs:
+                failures[position] = f"Duplicate mushroom id {doc['id']}"
+            else:
+                self.docs[doc["id"]] = dict(doc)
+        return failures
+
+    async def all(self):
+        return [dict(doc) for doc in self.docs.values()]
+
+    async def exists(self, mushroom_id):
+        return mushroom_id in self.docs
+
+    async def update(self, mushroom_id, fields, expected_seq):
+        doc = self.docs.get(mushroom_id)
+        if doc is None or (expected_seq is not None and doc.get("updated_seq") != expected_seq):
+            return None
+        doc.update(fields)
+        return dict(doc)
+
+    async def delete(self, mushroom_id):
+        return self.docs.pop(mushroom_id, None) is not None
+
+    async def changed_since(self, seq, limit):
+        changed = (doc for doc in self.docs.values() if doc.get("updated_seq", 0) > seq)
+        return [dict(doc) for doc in heapq.nsmallest(limit, changed, key=lambda doc: doc["updated_seq"])]
+
+
+class MemoryStatusRepository(StatusRepository):
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.docs: List[dict] = []  # oldest first
+        self.clients: Dict[str, dict] = {}
+
+    def _expire(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        del self.docs[:bisect.bisect_left(self.docs, cutoff, key=lambda doc: doc["timestamp"])]
+
+    async def insert(self, doc):
+        self._expire()
+        bisect.insort(self.docs, dict(doc), key=lambda doc: doc["timestamp"])
+        client = self.clients.setdefault(doc["client_name"], {
+            "client_name": doc["client_name"], "count": 0,
+            "first_seen": doc["timestamp"], "last_seen": doc["timestamp"],
+        })
+        client["count"] += 1
+        client["first_seen"] = min(client["first_seen"], doc["timestamp"])
+        client["last_seen"] = max(client["last_seen"], doc["timestamp"])
+
+    async def list(self, limit):
+        self._expire()
+        return [dict(doc) for doc in itertools.islice(reversed(self.docs), limit)]
+
+    async def summary(self, client_name=None):
+        if client_name is not None:
+            client = self.clients.get(client_name)
+            return [dict(client)] if client else []
+        return [dict(self.clients[name]) for name in sorted(self.clients)]
+
+
+class MemoryMetaRepository(MetaRepository):
+    def __init__(self):
+        self.seq = 0
+        self.versions: Dict[str, Tuple[int, datetime]] = {}
+        self.tombstones: List[dict] = []  # in updated_seq order
+
+    async def next_seq(self, count=1):
+        self.seq += count
+        return self.seq - count + 1
+
+    async def get_version(self, collection):
+        return self.versions.get(collection)
+
+    async def bump_version(self, collection):
+        version, _ = self.versions.get(collection, (0, None))
+        self.versions[collection] = (version + 1, datetime.utcnow())
+        return self.versions[collection]
+
+    async def add_tombstone(self, collection, doc_id, seq):
+        bisect.insort(self.tombstones, {"collection": collection, "id": doc_id, "updated_seq": seq},
+                      key=lambda tombstone: tombstone["updated_seq"])
+
+    async def tombstones_since(self, seq, limit):
+        start = bisect.bisect_right(self.tombstones, seq, key=lambda tombstone: tombstone["updated_seq"])
+        return [dict(tombstone) for tombstone in self.tombstones[start:start + limit]]
+
+
+class MemoryStorage(Storage):
+    def __init__(self, status_ttl_seconds: int):
+        super().__init__(
+            "memory", MemorySpotRepository(), MemoryCatalogRepository(), MemoryStatusRepository(status_ttl_seconds),
+            MemoryMetaRepository(),
+        )
+
+
+# SQLite
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spots (
+    rid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    mushroom_type TEXT NOT NULL,
+    notes TEXT,
+    photo_id TEXT,
+    timestamp TEXT NOT NULL,
+    created_by TEXT,
+    updated_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS spots_timestamp_id ON spots (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS spots_type_timestamp ON spots (mushroom_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS spots_updated_seq ON spots (updated_seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS spots_geo USING rtree (rid, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS mushrooms (
+    id TEXT PRIMARY KEY,
+    updated_seq INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mushrooms_updated_seq ON mushrooms (updated_seq);
+CREATE TABLE IF NOT EXISTS status_checks (
+    id TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS status_checks_timestamp ON status_checks (timestamp);
+CREATE TABLE IF NOT EXISTS status_clients (
+    client_name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    updated_seq INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    deleted_at TEXT NOT NULL
+);
+"""
+SPOT_COLUMNS = ["id", "latitude", "longitude", "mushroom_type", "notes", "photo_id", "timestamp", "created_by",
+                "updated_seq"]
+SPOT_UPDATABLE = {"mushroom_type", "notes", "photo_id", "updated_seq"}
+SPOT_FIELDS = ", ".join(f"s.{column}" for column in SPOT_COLUMNS)
+SPOT_SELECT = f"SELECT {SPOT_FIELDS} FROM spots s"
+# Rows whose R*Tree box overlaps the query box; the box is stored as float32, so
+# the exact coordinates are checked too
+SPOT_GEO_JOIN = (
+    " JOIN spots_geo g ON g.rid = s.rid"
+    " WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lon >= ? AND g.min_lon <= ?"
+    " AND s.latitude BETWEEN ? AND ? AND s.longitude BETWEEN ? AND ?"
+)
+
+
+def to_text(value: datetime) -> str:
+    """Fixed-width ISO text, so timestamps sort as strings"""
+    return naive_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def geo_params(bbox: BBox) -> list:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return [min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon]
+
+
+def spot_row(row) -> dict:
+    doc = dict(zip(SPOT_COLUMNS, row))
+    doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+    return doc
+
+
+class SQLiteDatabase:
+    """One connection used from a single worker thread, so calls are serialized"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.connection = None
+
+    def _open(self):
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SQLITE_SCHEMA)
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def open(self):
+        await self.run(self._open)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.run(self.connection.close)
+        self.executor.shutdown(wait=False)
+
+
+class SQLiteSpotRepository(SpotRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def _insert(self, connection, doc):
+        cursor = connection.execute(
+            f"INSERT INTO spots ({', '.join(SPOT_COLUMNS)}) VALUES ({', '.join('?' * len(SPOT_COLUMNS))})",
+            [to_text(doc[column]) if column == "timestamp" else doc.get(column) for column in SPOT_COLUMNS],
+        )
+        connection.execute(
+            "INSERT INTO spots_geo VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid, doc["latitude"], doc["latitude"], doc["longitude"], doc["longitude"]),
+        )
+
+    async def insert(self, doc):
+        def work():
+            with self.database.connection as connection:
+                self._insert(connection, doc)
+        await self.database.run(work)
+
+    async def insert_many(self, docs):
+        def work():
+            failures = {}
+            with self.database.connection as connection:
+                for position, doc in enumerate(docs):
+                    try:
+                        self._insert(connection, doc)
+                    except sqlite3.IntegrityError as e:
+                        failures[position] = str(e)
+            return failures
+        return await self.database.run(work)
+
+    async def _fetch(self, sql, params, summary=True):
+        def work():
+            return self.database.connection.execute(sql, params).fetchall()
+        rows = [spot_row(row) for row in await self.database.run(work)]
+        return [spot_summary(row) for row in rows] if summary else rows
+
+    async def get(self, spot_id):
+        rows = await self._fetch(f"{SPOT_SELECT} WHERE s.id = ?", [spot_id], summary=False)
+        return rows[0] if rows else None
+
+    async def exists(self, spot_id):
+        return await self.get(spot_id) is not None
+
+    async def list_page(self, after, limit):
+        if after:
+            return await self._fetch(
+                f"{SPOT_SELECT} WHERE (s.timestamp, s.id) < (?, ?) ORDER BY s.timestamp DESC, s.id DESC LIMIT ?",
+                [to_text(after[0]), after[1], limit],
+            )
+        return await self._fetch(f"{SPOT_SELECT} ORDER BY s.timestamp DESC, s.id DESC LIMIT ?", [limit])
+
+    async def in_bbox(self, bbox, limit):
+        return await self._fetch(
+            f"{SPOT_SELECT}{SPOT_GEO_JOIN} ORDER BY s.timestamp DESC LIMIT ?", geo_params(bbox) + [limit]
+        )
+
+    async def clusters(self, bbox, cell_size):
+        def work():
+            return self.database.connection.execute(
+                f"SELECT s.latitude, s.longitude FROM spots s{SPOT_GEO_JOIN}", geo_params(bbox)
+            ).fetchall()
+        return grid_clusters(await self.database.run(work), cell_size)
+
+    async def nearby(self, latitude, longitude, radius_km, limit):
+        found = []
+        for doc in await self._fetch(f"{SPOT_SELECT}{SPOT_GEO_JOIN}",
+                                     geo_params(radius_bbox(latitude, longitude, radius_km))):
+            distance = distance_km(latitude, longitude, doc["latitude"], doc["longitude"])
+            if distance <= radius_km:
+                found.append({**doc, "distance_km": distance})
+        return heapq.nsmallest(limit, found, key=lambda doc: doc["distance_km"])
+
+    async def export(self, fields, mushroom_type, since, until, bbox, batch_size):
+        sql, params, where = SPOT_SELECT, [], []
+        if bbox:
+            sql += SPOT_GEO_JOIN
+            params += geo_params(bbox)
+        if mushroom_type:
+            where.append("s.mushroom_type = ?")
+            params.append(mushroom_type)
+        if since:
+            where.append("s.timestamp >= ?")
+            params.append(to_text(since))
+        if until:
+            where.append("s.timestamp < ?")
+            params.append(to_text(until))
+        if where:
+            sql += (" AND " if bbox else " WHERE ") + " AND ".join(where)
+        cursor = await self.database.run(lambda: self.database.connection.execute(
+            sql + " ORDER BY s.timestamp DESC", params
+        ))
+        while True:
+            rows = await self.database.run(cursor.fetchmany, batch_size)
+            if not rows:
+                break
+            yield [{field: doc.get(field) for field in fields} for doc in map(spot_row, rows)]
+
+    async def update(self, spot_id, fields, expected_seq, return_before=False):
+        unknown = set(fields) - SPOT_UPDATABLE
+        if unknown:
+            raise ValueError(f"Cannot update {', '.join(sorted(unknown))}")
+
+        def work():
+            with self.database.connection as connection:
+                row = connection.execute(f"{SPOT_SELECT} WHERE s.id = ?", [spot_id]).fetchone()
+                if row is None:
+                    return None
+                before = spot_row(row)
+                if expected_seq is not None and before["updated_seq"] != expected_seq:
+                    return None
+                if fields:
+                    assignments = ", ".join(f"{column} = ?" for column in fields)
+                    connection.execute(f"UPDATE spots SET {assignments} WHERE id = ?", [*fields.values(), spot_id])
+                return before if return_before else {**before, **fields}
+        return await self.database.run(work)
+
+    async def delete(self, spot_id):
+        def work():
+            with self.database.connection as connection:
+                row = connection.execute(f"SELECT s.rid, {SPOT_FIELDS} FROM spots s WHERE s.id = ?", [spot_id]).fetchone()
+                if row is None:
+                    return None
+                connection.execute("DELETE FROM spots WHERE rid = ?", [row[0]])
+                connection.execute("DELETE FROM spots_geo WHERE rid = ?", [row[0]])
+                return spot_row(row[1:])
+        return await self.database.run(work)
+
+    async def changed_since(self, seq, limit):
+        return await self._fetch(
+            f"{SPOT_SELECT} WHERE s.updated_seq > ? ORDER BY s.updated_seq LIMIT ?", [seq, limit], summary=False
+        )
+
+
+class SQLiteCatalogRepository(CatalogRepository):
+    """Entries are stored as JSON, with the columns the queries need alongside"""
+
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    @staticmethod
+    def _insert(connection, doc):
+        connection.execute(
+            "INSERT INTO mushrooms (id, updated_seq, doc) VALUES (?, ?, ?)",
+            (doc["id"], doc.get("updated_seq", 0), json.dumps(doc, ensure_ascii=False)),
+        )
+
+    async def insert(self, doc):
+        def work():
+            with self.database.connection as connection:
+                self._insert(connection, doc)
+        await self.database.run(work)
+
+    async def insert_many(self, docs):
+        def work():
+            failures = {}
+            with self.database.connection as connection:
+                for position, doc in enumerate(docs):
+                    try:
+                        self._insert(connection, doc)
+                    except sqlite3.IntegrityError as e:
+                        failures[position] = str(e)
+            return failures
+        return await self.database.run(work)
+
+    async def _fetch(self, sql, params):
+        def work():
+            return self.database.connection.execute(sql, params).fetchall()
+        return [json.loads(doc) for doc, in await self.database.run(work)]
+
+    async def all(self):
+        return await self._fetch("SELECT doc FROM mushrooms", [])
+
+    async def exists(self, mushroom_id):
+        return bool(await self._fetch("SELECT doc FROM mushrooms WHERE id = ?", [mushroom_id]))
+
+    async def update(self, mushroom_id, fields, expected_seq):
+        def work():
+            with self.database.connection as connection:
+                row = connection.execute("SELECT doc FROM mushrooms WHERE id = ?", [mushroom_id]).fetchone()
+                if row is None:
+                    return None
+                doc = json.loads(row[0])
+                if expected_seq is not None and doc.get("updated_seq") != expected_seq:
+                    return None
+                doc.update(fields)
+                connection.execute(
+                    "UPDATE mushrooms SET updated_seq = ?, doc = ? WHERE id = ?",
+                    (doc.get("updated_seq", 0), json.dumps(doc, ensure_ascii=False), mushroom_id),
+                )
+                return doc
+        return await self.database.run(work)
+
+    async def delete(self, mushroom_id):
+        def work():
+            with self.database.connection as connection:
+                return connection.execute("DELETE FROM mushrooms WHERE id = ?", [mushroom_id]).rowcount > 0
+        return await self.database.run(work)
+
+    async def changed_since(self, seq, limit):
+        return await self._fetch(
+            "SELECT doc FROM mushrooms WHERE updated_seq > ? ORDER BY updated_seq LIMIT ?", [seq, limit]
+        )
+
+
+class SQLiteStatusRepository(StatusRepository):
+    """Expired checks are deleted as new ones come in, through the timestamp index"""
+
+    def __init__(self, database: SQLiteDatabase, ttl_seconds: int):
+        self.database = database
+        self.ttl_seconds = ttl_seconds
+
+    def _cutoff(self) -> str:
+        return to_text(datetime.utcnow() - timedelta(seconds=self.ttl_seconds))
+
+    async def insert(self, doc):
+        timestamp = to_text(doc["timestamp"])
+
+        def work():
+            with self.database.connection as connection:
+                connection.execute("DELETE FROM status_checks WHERE timestamp < ?", [self._cutoff()])
+                connection.execute(
+                    "INSERT INTO status_checks (id, client_name, timestamp) VALUES (?, ?, ?)",
+                    (doc["id"], doc["client_name"], timestamp),
+                )
+                connection.execute(
+                    "INSERT INTO status_clients (client_name, count, first_seen, last_seen) VALUES (?, 1, ?, ?)"
+                    " ON CONFLICT (client_name) DO UPDATE SET count = count + 1,"
+                    " first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen)",
+                    (doc["client_name"], timestamp, timestamp),
+                )
+        await self.database.run(work)
+
+    async def list(self, limit):
+        def work():
+            return self.database.connection.execute(
+                "SELECT id, client_name, timestamp FROM status_checks WHERE timestamp >= ?"
+                " ORDER BY timestamp DESC LIMIT ?",
+                [self._cutoff(), limit],
+            ).fetchall()
+        return [
+            {"id": status_id, "client_name": client_name, "timestamp": datetime.fromisoformat(timestamp)}
+            for status_id, client_name, timestamp in await self.database.run(work)
+        ]
+
+    async def summary(self, client_name=None):
+        def work():
+            sql = "SELECT client_name, count, first_seen, last_seen FROM status_clients"
+            if client_name is not None:
+                return self.database.connection.execute(sql + " WHERE client_name = ?", [client_name]).fetchall()
+            return self.database.connection.execute(sql + " ORDER BY client_name").fetchall()
+        return [
+            {"client_name": name, "count": count, "first_seen": datetime.fromisoformat(first_seen),
+             "last_seen": datetime.fromisoformat(last_seen)}
+            for name, count, first_seen, last_seen in await self.database.run(work)
+        ]
+
+
+class SQLiteMetaRepository(MetaRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def next_seq(self, count=1):
+        def work():
+            with self.database.connection as connection:
+                connection.execute(
+                    "INSERT INTO counters (name, value) VALUES ('updated_seq', ?)"
+                    " ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    [count],
+                )
+                return connection.execute("SELECT value FROM counters WHERE name = 'updated_seq'").fetchone()[0]
+        return await self.database.run(work) - count + 1
+
+    async def get_version(self, collection):
+        def work():
+            return self.database.connection.execute(
+                "SELECT version, updated_at FROM collection_versions WHERE name = ?", [collection]
+            ).fetchone()
+        row = await self.database.run(work)
+        return (row[0], datetime.fromisoformat(row[1])) if row else None
+
+    async def bump_version(self, collection):
+        def work():
+            now = datetime.utcnow()
+            with self.database.connection as connection:
+                connection.execute(
+                    "INSERT INTO collection_versions (name, version, updated_at) VALUES (?, 1, ?)"
+                    " ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+                    [collection, to_text(now)],
+                )
+                version = connection.execute(
+                    "SELECT version FROM collection_versions WHERE name = ?", [collection]
+                ).fetchone()[0]
+            return version, now
+        return await self.database.run(work)
+
+    async def add_tombstone(self, collection, doc_id, seq):
+        def work():
+            with self.database.connection as connection:
+                connection.execute(
+                    "INSERT INTO tombstones (updated_seq, collection, id, deleted_at) VALUES (?, ?, ?, ?)",
+                    (seq, collection, doc_id, to_text(datetime.utcnow())),
+                )
+        await self.database.run(work)
+
+    async def tombstones_since(self, seq, limit):
+        def work():
+            return self.database.connection.execute(
+                "SELECT collection, id, updated_seq FROM tombstones WHERE updated_seq > ? ORDER BY updated_seq LIMIT ?",
+                [seq, limit],
+            ).fetchall()
+        return [
+            {"collection": collection, "id": doc_id, "updated_seq": updated_seq}
+            for collection, doc_id, updated_seq in await self.database.run(work)
+        ]
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str, status_ttl_seconds: int):
+        self.database = SQLiteDatabase(path)
+        super().__init__(
+            "sqlite", SQLiteSpotRepository(self.database), SQLiteCatalogRepository(self.database),
+            SQLiteStatusRepository(self.database, status_ttl_seconds), SQLiteMetaRepository(self.database),
+        )
+
+    async def startup(self):
+        await self.database.open()
+
+    async def close(self):
+        await self.database.close()
+
+
+STORAGE_BACKENDS = ("mongo", "memory", "sqlite")
+
+
+STATUS_TTL_SECONDS = 7 * 24 * 3600
+
+
+def create_storage(backend: str, db=None, sqlite_path: str = "mushrooms.sqlite3",
+                   status_ttl_seconds: int = STATUS_TTL_SECONDS) -> Storage:
+    """The mongo backend also expires status checks through the TTL index in server.INDEXES"""
+    if backend == "mongo":
+        return MotorStorage(db, status_ttl_seconds)
+    if backend == "memory":
+        return MemoryStorage(status_ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path, status_ttl_seconds)
+    raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(STORAGE_BACKENDS)}")
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the API.
+
+Starts backend/server.py under uvicorn on a free local port, grows the spot
+collection to each dataset size through the bulk endpoint, then drives every
+scenario with a concurrent asyncio client and reports p50/p95/p99 latency and
+requests per second. The time from launching the server to its first
+successful response (the cold start to first byte) and the startup phases the
+server reports are recorded too. Results are written as JSON so runs can be
+compared.
+
+    python benchmarks/load.py run --sizes 1000,10000,100000 --output before.json
+    python benchmarks/load.py run --storage memory --scenarios search,create
+    python benchmarks/load.py compare before.json after.json
+
+--storage picks the server's storage backend (STORAGE_BACKEND, see
+backend/storage.py). With mongo, --mongo is the MongoDB URL (default
+mongodb://localhost:27017) and a throwaway database is created and dropped;
+sqlite uses a throwaway file; memory needs nothing. Running the same scenarios
+on memory and on mongo separates the API layer's cost from the database's
+(photos, which need GridFS, are not exercised by any scenario).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+STORAGE_BACKENDS = ("mongo", "memory", "sqlite")
+BULK_BATCH = 10000  # server.BULK_MAX_ITEMS
+SEARCH_TERMS = ["cepe", "girolle", "amanite", "morille", "bolet", "trompette", "pied", "chene", "lactaire"]
+MUSHROOM_TYPES = ["Cèpe de Bordeaux", "Girolle", "Morille", "Trompette de la mort", "Pied de mouton", "Lactaire délicieux"]
+# Spots are spread over a box around the Massif Central
+LAT_RANGE = (44.5, 46.5)
+LON_RANGE = (2.0, 4.5)
+
+
+def random_spot(rng):
+    return {
+        "latitude": round(rng.uniform(*LAT_RANGE), 6),
+        "longitude": round(rng.uniform(*LON_RANGE), 6),
+        "mushroom_type": rng.choice(MUSHROOM_TYPES),
+        "notes": "benchmark",
+    }
+
+
+def catalog_entry(name):
+    return {
+        "common_name": name,
+        "latin_name": f"{name} (benchmark)",
+        "edibility": "comestible",
+        "season": "automne",
+        "description": "Entrée de catalogue générée pour le benchmark",
+        "characteristics": ["chapeau brun", "pied épais"],
+        "habitat": "forêt de chênes et de hêtres",
+        "photos_base64": [],
+    }
+
+
+# Scenarios: name -> builds one request from a random generator
+def list_request(rng):
+    return "GET", "/api/mushroom-spots", {"params": {"limit": 100}}
+
+
+def nearby_request(rng):
+    latitude, longitude = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+    return "GET", f"/api/mushroom-spots/nearby/{latitude:.5f}/{longitude:.5f}", {"params": {"radius_km": 5}}
+
+
+def search_request(rng):
+    return "GET", "/api/mushrooms", {"params": {"search": rng.choice(SEARCH_TERMS), "limit": 20}}
+
+
+def create_request(rng):
+    return "POST", "/api/mushroom-spots", {"json": random_spot(rng)}
+
+
+def bulk_create_request(rng):
+    return "POST", "/api/mushroom-spots/bulk", {"json": [random_spot(rng) for _ in range(100)]}
+
+
+SCENARIOS = {
+    "list": list_request,
+    "nearby": nearby_request,
+    "search": search_request,
+    "create": create_request,
+    "bulk_create": bulk_create_request,
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(storage, mongo, db_name, sqlite_path, port):
+    # Only the mongo backend builds a Motor client and reads MONGO_URL
+    env = {**os.environ, "STORAGE_BACKEND": storage, "MONGO_URL": mongo, "DB_NAME": db_name,
+           "SQLITE_PATH": sqlite_path}
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_up(client, server=None, timeout=60.0):
+    """Poll the readiness probe until the server is warm; returns its startup report"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            response = await client.get("/api/health/ready")
+            if response.status_code == 200:
+                return response.json()["startup"]
+        except httpx.TransportError:
+            pass
+        # Short polls, so the measured cold start is not rounded up by much
+        await asyncio.sleep(0.01)
+    raise RuntimeError("Server did not come up")
+
+
+async def grow_dataset(client, current, target, rng):
+    while current < target:
+        batch = [random_spot(rng) for _ in range(min(BULK_BATCH, target - current))]
+        response = await client.post("/api/mushroom-spots/bulk", json=batch, timeout=300)
+        response.raise_for_status()
+        current += response.json()["inserted"]
+    return current
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return round(sorted_values[index] * 1000, 3)
+
+
+async def run_scenario(client, name, requests, warmup, concurrency, rng):
+    """Send warmup unmeasured requests, then time `requests` more; only the latter are reported"""
+    build = SCENARIOS[name]
+    latencies, statuses, errors = [], {}, 0
+
+    async def drive(count, record):
+        queue = asyncio.Queue()
+        for _ in range(count):
+            queue.put_nowait(build(rng))
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    method, url, kwargs = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    await response.aread()
+                except httpx.HTTPError:
+                    if record:
+                        errors += 1
+                    continue
+                if not record:
+                    continue
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code >= 400:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    await drive(warmup, record=False)
+    start = time.perf_counter()
+    await drive(requests, record=True)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "warmup": warmup,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "max": round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+    }
+
+
+async def run_benchmark(args, base_url, server=None, launched=None):
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        startup = await wait_until_up(client, server)
+        cold_start = {
+            # Measured from outside: launching uvicorn to the first successful response
+            "first_byte_seconds": None if launched is None else round(time.perf_counter() - launched, 3),
+            "phases": startup["phases"],
+        }
+        if launched is not None:
+            print(f"cold start to first byte: {cold_start['first_byte_seconds']}s", file=sys.stderr)
+        for name in SEARCH_TERMS:
+            await client.post("/api/mushrooms", json=catalog_entry(name.capitalize()))
+        spots = 0
+        for size in args.sizes:
+            started = time.perf_counter()
+            spots = await grow_dataset(client, spots, size, rng)
+            print(f"dataset {size}: seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            for name in args.scenarios:
+                requests = args.bulk_requests if name == "bulk_create" else args.requests
+                result = await run_scenario(client, name, requests, min(requests, args.warmup), args.concurrency, rng)
+                results.append({"scenario": name, "dataset_size": size, **result})
+                print(f"  {name:12} {result['rps']:>9} req/s  p50 {result['latency_ms']['p50']} ms"
+                      f"  p95 {result['latency_ms']['p95']} ms  p99 {result['latency_ms']['p99']} ms"
+                      f"  errors {result['errors']}", file=sys.stderr)
+                # Writes, warmup included, grow the collection; keep the next size's starting point honest
+                if name == "create":
+                    spots += result["requests"] + result["warmup"]
+                elif name == "bulk_create":
+                    spots += (result["requests"] + result["warmup"]) * 100
+    return results, cold_start
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    db_name = f"benchmark_{int(time.time())}"
+    sqlite_path = str(Path(tempfile.gettempdir()) / f"{db_name}.sqlite3")
+    server = launched = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        port = free_port()
+        launched = time.perf_counter()
+        server = start_server(args.storage, args.mongo, db_name, sqlite_path, port)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        results, cold_start = asyncio.run(run_benchmark(args, base_url, server, launched))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if not args.base_url and not args.keep_data:
+            if args.storage == "mongo":
+                from pymongo import MongoClient
+
+                MongoClient(args.mongo).drop_database(db_name)
+            elif args.storage == "sqlite":
+                for suffix in ("", "-wal", "-shm"):
+                    Path(sqlite_path + suffix).unlink(missing_ok=True)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "storage": args.storage,
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "cold_start": cold_start,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+def relative_change(old, new):
+    """(new - old) / old, None when either side is missing or old is zero"""
+    if old is None or new is None or old == 0:
+        return None
+    return (new - old) / old
+
+
+def format_change(change):
+    return f"{change:+7.1%}" if change is not None else f"{'n/a':>7}"
+
+
+def compare(args):
+    """Print the change in cold start, rps and p95 per scenario; exit 1 on a regression over the threshold"""
+    before, after = (json.loads(Path(path).read_text()) for path in (args.before, args.after))
+    baseline = {(r["scenario"], r["dataset_size"]): r for r in before["results"]}
+    regressions = 0
+    old_cold, new_cold = ((report.get("cold_start") or {}).get("first_byte_seconds") for report in (before, after))
+    cold_change = relative_change(old_cold, new_cold)
+    if cold_change is not None:
+        regressed = cold_change > args.threshold
+        regressions += regressed
+        print(f"{'cold_start':12} {'':>9}  first byte {old_cold}s -> {new_cold}s ({cold_change:+.1%})"
+              f"{'  REGRESSION' if regressed else ''}")
+    for result in after["results"]:
+        old = baseline.get((result["scenario"], result["dataset_size"]))
+        if old is None:
+            continue
+        # A scenario whose requests all failed has no latency percentiles; such metrics are skipped
+        rps_change = relative_change(old["rps"], result["rps"])
+        p95_change = relative_change(old["latency_ms"]["p95"], result["latency_ms"]["p95"])
+        regressed = (rps_change is not None and rps_change < -args.threshold) or (
+            p95_change is not None and p95_change > args.threshold
+        )
+        regressions += regressed
+        print(f"{result['scenario']:12} {result['dataset_size']:>9}  rps {format_change(rps_change)}"
+              f"  p95 {format_change(p95_change)}{'  REGRESSION' if regressed else ''}")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Start the server and run the scenarios")
+    run_parser.add_argument("--storage", choices=STORAGE_BACKENDS, default="mongo", help="Server storage backend")
+    run_parser.add_argument("--mongo", default="mongodb://localhost:27017", help="MongoDB URL")
+    run_parser.add_argument("--base-url", help="Benchmark an already running server instead of starting one")
+    run_parser.add_argument("--sizes", default="1000,10000",
+                            type=lambda value: sorted(int(size) for size in value.split(",")),
+                            help="Comma-separated dataset sizes, up to 1000000")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                            type=lambda value: [name for name in value.split(",") if name in SCENARIOS])
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--bulk-requests", type=int, default=50)
+    run_parser.add_argument("--warmup", type=int, default=50)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--keep-data", action="store_true", help="Do not drop the benchmark database or file")
+    run_parser.add_argument("--output", help="Write the results as JSON to this file")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative slowdown")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for list endpoints.
+
+Compares the CPU time of the validated path (build a Pydantic model per row,
+validate it again against response_model, encode with json) with the trusted
+path used by server.trusted_response (orjson straight from the Mongo rows).
+
+    python benchmarks/serialization.py --items 1000 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+# server.py reads these at import time; no connection is made by this benchmark
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import MushroomSpotSummary  # noqa: E402
+
+
+def make_rows(count):
+    """Rows shaped like the SPOT_SUMMARY_PROJECTION output"""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": f"spot-{i:07d}",
+            "latitude": 45.0 + i * 1e-4,
+            "longitude": 3.0 - i * 1e-4,
+            "mushroom_type": "Cèpe de Bordeaux",
+            "notes": "Sous les hêtres, près du ruisseau",
+            "timestamp": now - timedelta(minutes=i),
+            "created_by": "Utilisateur",
+            "photo_id": None,
+            "has_photo": False,
+        }
+        for i in range(count)
+    ]
+
+
+def validated(rows, adapter):
+    models = [MushroomSpotSummary(**row) for row in rows]
+    content = adapter.dump_python(adapter.validate_python(models), mode="json")
+    # Same encoding as starlette.responses.JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def trusted(rows, adapter):
+    return orjson.dumps(rows)
+
+
+def measure(func, rows, adapter, repeat):
+    func(rows, adapter)  # Warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        body = func(rows, adapter)
+    elapsed = time.process_time() - start
+    return {"cpu_ms_per_request": round(elapsed / repeat * 1000, 3), "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rows = make_rows(args.items)
+    adapter = TypeAdapter(List[MushroomSpotSummary])
+    results = {
+        "items": args.items,
+        "repeat": args.repeat,
+        "validated": measure(validated, rows, adapter, args.repeat),
+        "trusted": measure(trusted, rows, adapter, args.repeat),
+    }
+    saved = results["validated"]["cpu_ms_per_request"] - results["trusted"]["cpu_ms_per_request"]
+    results["cpu_ms_saved_per_request"] = round(saved, 3)
+    results["speedup"] = round(
+        results["validated"]["cpu_ms_per_request"] / max(results["trusted"]["cpu_ms_per_request"], 1e-9), 1
+    )
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
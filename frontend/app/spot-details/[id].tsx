@@ -26,7 +26,7 @@ interface MushroomSpot {
   longitude: number;
   mushroom_type: string;
   notes: string;
-  photo_base64?: string;
+  photo_id?: string;
   timestamp: string;
   created_by: string;
 }
@@ -199,10 +199,10 @@ function SpotDetailsScreen() {
       </View>
 
       <ScrollView style={styles.content} showsVerticalScrollIndicator={false}>
-        {spot.photo_base64 && (
+        {spot.photo_id && (
           <View style={styles.imageContainer}>
             <Image
-              source={{ uri: `data:image/jpeg;base64,${spot.photo_base64}` }}
+              source={{ uri: `${EXPO_PUBLIC_BACKEND_URL}/api/photos/${spot.photo_id}?size=medium` }}
               style={styles.mainImage}
               resizeMode="cover"
             />
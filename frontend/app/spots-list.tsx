@@ -24,7 +24,7 @@ interface MushroomSpot {
   longitude: number;
   mushroom_type: string;
   notes: string;
-  photo_base64?: string;
+  photo_id?: string;
   timestamp: string;
 }
 
@@ -129,9 +129,9 @@ function SpotsListContent() {
           </View>
         </View>
 
-        {item.photo_base64 && (
+        {item.photo_id && (
           <Image
-            source={{ uri: `data:image/jpeg;base64,${item.photo_base64}` }}
+            source={{ uri: `${EXPO_PUBLIC_BACKEND_URL}/api/photos/${item.photo_id}?size=thumbnail` }}
             style={styles.thumbnail}
           />
         )}
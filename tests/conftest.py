@@ -0,0 +1,67 @@
+"""The API on the memory storage backend, through FastAPI's TestClient.
+
+No MongoDB is needed: with STORAGE_BACKEND=memory server.py builds no Motor
+client, and photo routes answer 503.
+"""
+import base64
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Set before server.py is imported; load_dotenv does not override them
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("PHOTO_CACHE_DIR", tempfile.mkdtemp(prefix="photo_cache-"))
+os.environ.setdefault("PROFILE_DIR", tempfile.mkdtemp(prefix="profiles-"))
+os.environ.pop("PROFILE_ADMIN_TOKEN", None)
+
+
+@pytest.fixture
+def server():
+    """server.py with empty storage, version cache, catalog cache and sequence reservations"""
+    import server as module
+    from storage import create_storage
+
+    module.storage = create_storage("memory", status_ttl_seconds=module.STATUS_CHECK_TTL_SECONDS)
+    module.collection_versions.clear()
+    module.seq_reservations = module.SeqReservations()
+    module.catalog_cache = module.CatalogCache(ttl_seconds=module.catalog_cache.ttl_seconds)
+    return module
+
+
+@pytest.fixture
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+def spot_payload(**overrides) -> dict:
+    payload = {"latitude": 45.0, "longitude": 5.0, "mushroom_type": "Cèpe de Bordeaux"}
+    payload.update(overrides)
+    return payload
+
+
+def mushroom_payload(**overrides) -> dict:
+    payload = {
+        "common_name": "Cèpe de Bordeaux",
+        "latin_name": "Boletus edulis",
+        "edibility": "comestible",
+        "season": "Automne",
+        "description": "Chapeau brun, pied renflé.",
+        "characteristics": ["Chapeau brun", "Tubes blancs"],
+        "habitat": "Forêts de feuillus et de conifères",
+    }
+    payload.update(overrides)
+    return payload
+
+
+def cursor_of(values) -> str:
+    """A page token holding arbitrary JSON, like encode_cursor builds"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
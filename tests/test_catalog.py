@@ -0,0 +1,118 @@
+import pytest
+
+from tests.conftest import cursor_of, mushroom_payload
+
+
+def test_list_follows_keyset_cursor_in_name_order(client):
+    names = ["Girolle", "Amanite phalloïde", "Morille", "Cèpe de Bordeaux", "Pied de mouton"]
+    for name in names:
+        assert client.post("/api/mushrooms", json=mushroom_payload(common_name=name)).status_code == 200
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/mushrooms", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(mushroom["common_name"] for mushroom in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert seen == sorted(names)
+
+
+def test_search_ranks_exact_names_first(client):
+    client.post("/api/mushrooms", json=mushroom_payload(
+        common_name="Fausse girolle", latin_name="Hygrophoropsis aurantiaca",
+        characteristics=["Ressemble à la girolle"],
+    ))
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Girolle", latin_name="Cantharellus cibarius"))
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Morille", latin_name="Morchella esculenta"))
+
+    results = client.get("/api/mushrooms", params={"search": "girolle"}).json()
+
+    assert [mushroom["common_name"] for mushroom in results] == ["Girolle", "Fausse girolle"]
+
+
+def test_search_ignores_accents_and_tolerates_typos(client):
+    client.post("/api/mushrooms", json=mushroom_payload())
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Morille", latin_name="Morchella esculenta",
+                                                        characteristics=["Chapeau alvéolé"], habitat="Vergers"))
+
+    assert [m["common_name"] for m in client.get("/api/mushrooms", params={"search": "cepe"}).json()] == [
+        "Cèpe de Bordeaux"
+    ]
+    assert [m["common_name"] for m in client.get("/api/mushrooms", params={"search": "morrille"}).json()] == [
+        "Morille"
+    ]
+
+
+def test_search_pages_with_an_offset_cursor(client):
+    for i in range(3):
+        client.post("/api/mushrooms", json=mushroom_payload(common_name=f"Bolet {i}", latin_name=f"Boletus {i}"))
+
+    first = client.get("/api/mushrooms", params={"search": "bolet", "limit": 2})
+    second = client.get("/api/mushrooms", params={"search": "bolet", "limit": 2,
+                                                  "cursor": first.headers["x-next-cursor"]})
+
+    names = [m["common_name"] for m in first.json() + second.json()]
+    assert sorted(names) == ["Bolet 0", "Bolet 1", "Bolet 2"]
+    assert "x-next-cursor" not in second.headers
+
+
+def test_catalog_answers_304_until_a_write(client):
+    client.post("/api/mushrooms", json=mushroom_payload())
+    etag = client.get("/api/mushrooms").headers["etag"]
+
+    assert client.get("/api/mushrooms", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Girolle"))
+    assert client.get("/api/mushrooms", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_update_with_stale_if_match_is_rejected(client):
+    mushroom = client.post("/api/mushrooms", json=mushroom_payload()).json()
+    url = f"/api/mushrooms/{mushroom['id']}"
+    stale = {"If-Match": f'"{mushroom["updated_seq"]}"'}
+
+    assert client.put(url, json=mushroom_payload(season="Été"), headers=stale).status_code == 200
+    assert client.put(url, json=mushroom_payload(season="Hiver"), headers=stale).status_code == 412
+    assert client.get(url).json()["season"] == "Été"
+
+
+def test_cache_reloads_after_a_write_from_another_worker(client, server):
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Cèpe de Bordeaux"))
+    assert len(client.get("/api/mushrooms").json()) == 1
+
+    async def write_from_another_worker():
+        mushroom = server.MushroomInfo(**mushroom_payload(common_name="Girolle"))
+        await server.storage.catalog.insert(mushroom.model_dump())
+        await server.storage.meta.bump_version("mushroom_database")
+
+    client.portal.call(write_from_another_worker)
+    client.post("/api/mushrooms", json=mushroom_payload(common_name="Morille"))
+
+    names = [mushroom["common_name"] for mushroom in client.get("/api/mushrooms").json()]
+    assert names == ["Cèpe de Bordeaux", "Girolle", "Morille"]
+
+
+def test_get_etag_is_accepted_as_if_match(client):
+    mushroom = client.post("/api/mushrooms", json=mushroom_payload()).json()
+    url = f"/api/mushrooms/{mushroom['id']}"
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.put(url, json=mushroom_payload(season="Été"), headers={"If-Match": etag}).status_code == 200
+    assert client.put(url, json=mushroom_payload(season="Hiver"), headers={"If-Match": etag}).status_code == 412
+
+
+@pytest.mark.parametrize("values", [[1, 2], ["Girolle"], ["Girolle", None], {"a": 1}])
+def test_list_rejects_malformed_cursors(client, values):
+    client.post("/api/mushrooms", json=mushroom_payload())
+    assert client.get("/api/mushrooms", params={"cursor": cursor_of(values)}).status_code == 400
+    assert client.get("/api/mushrooms", params={"cursor": "not base64 json!"}).status_code == 400
+
+
+@pytest.mark.parametrize("values", [[-1], ["2"], [1.5], [True], [1, 2]])
+def test_search_rejects_malformed_cursors(client, values):
+    client.post("/api/mushrooms", json=mushroom_payload())
+    response = client.get("/api/mushrooms", params={"search": "cepe", "cursor": cursor_of(values)})
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+from tests.conftest import spot_payload
+
+
+def create_spots(client, count):
+    client.post("/api/mushroom-spots/bulk", json=[spot_payload(notes=f"spot {i}") for i in range(count)])
+
+
+def test_compressed_response_has_a_weak_etag(client):
+    create_spots(client, 50)
+
+    gzipped = client.get("/api/mushroom-spots", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/api/mushroom-spots", headers={"Accept-Encoding": "identity"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["etag"] == "W/" + identity.headers["etag"]
+    assert not identity.headers["etag"].startswith("W/")
+    for response in (gzipped, identity):
+        assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_weak_etag_revalidates(client):
+    create_spots(client, 50)
+    etag = client.get("/api/mushroom-spots", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    cached = client.get("/api/mushroom-spots", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_small_bodies_still_vary_on_encoding(client):
+    create_spots(client, 1)
+
+    response = client.get("/api/mushroom-spots", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert not response.headers["etag"].startswith("W/")
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
@@ -0,0 +1,47 @@
+from datetime import timezone
+
+import cbor2
+import msgpack
+
+from tests.conftest import spot_payload
+
+
+def test_binary_encodings_carry_native_timestamps(client):
+    spot = client.post("/api/mushroom-spots", json=spot_payload()).json()
+    url = f"/api/mushroom-spots/{spot['id']}"
+
+    from_json = client.get(url).json()["timestamp"]
+    from_msgpack = msgpack.unpackb(client.get(url, headers={"Accept": "application/msgpack"}).content, timestamp=3)
+    from_cbor = cbor2.loads(client.get(url, headers={"Accept": "application/cbor"}).content)
+
+    assert from_msgpack["timestamp"] == from_cbor["timestamp"]
+    assert from_msgpack["timestamp"].tzinfo == timezone.utc
+    assert from_msgpack["timestamp"].replace(tzinfo=None).isoformat() == from_json
+
+
+def test_columnar_layout_matches_its_model(client, server):
+    client.post("/api/mushroom-spots", json=spot_payload(mushroom_type="Girolle"))
+    client.post("/api/mushroom-spots", json=spot_payload())
+    client.post("/api/mushroom-spots", json=spot_payload(mushroom_type="Girolle"))
+
+    body = client.get("/api/mushroom-spots", params={"layout": "columnar"}).json()
+    columns = server.ColumnarSpots.model_validate(body)
+    assert sorted(columns.types) == ["Cèpe de Bordeaux", "Girolle"]
+    assert sorted(columns.types[i] for i in columns.type_index) == ["Cèpe de Bordeaux", "Girolle", "Girolle"]
+
+    nearby = client.get("/api/mushroom-spots/nearby/45.0/5.0", params={"layout": "columnar"}).json()
+    assert server.ColumnarNearbySpots.model_validate(nearby).distance_km == [0.0, 0.0, 0.0]
+
+
+def test_openapi_documents_both_layouts(client):
+    paths = client.get("/openapi.json").json()["paths"]
+
+    def schema_refs(path):
+        schema = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        return str(schema)
+
+    assert "MushroomSpotSummary" in schema_refs("/api/mushroom-spots")
+    assert "ColumnarSpots" in schema_refs("/api/mushroom-spots")
+    assert "ColumnarNearbySpots" in schema_refs("/api/mushroom-spots/nearby/{latitude}/{longitude}")
+    components = client.get("/openapi.json").json()["components"]["schemas"]
+    assert "ColumnarSpots" in str(components["ViewportSpots"]["properties"]["spots"])
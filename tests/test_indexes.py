@@ -0,0 +1,12 @@
+from pymongo import ASCENDING, IndexModel
+
+
+def test_ttl_only_change(server):
+    wanted = IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=3600).document
+    current = {"v": 2, "key": {"timestamp": 1}, "name": "timestamp_1", "expireAfterSeconds": 60}
+
+    assert server.ttl_only_change(current, wanted)
+    assert not server.ttl_only_change({**current, "key": {"timestamp": -1}}, wanted)
+    assert not server.ttl_only_change({**current, "unique": True}, wanted)
+    without_ttl = {key: value for key, value in current.items() if key != "expireAfterSeconds"}
+    assert not server.ttl_only_change(without_ttl, wanted)
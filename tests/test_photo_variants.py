@@ -0,0 +1,43 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from photo_variants import (
+    VARIANT_SIZES, InvalidPhoto, PhotoTooLarge, check_image, remove_variants, render_variants, variant_path,
+)
+
+
+def png(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "brown").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_check_image_accepts_a_valid_photo():
+    check_image(png(64, 48))
+
+
+def test_check_image_rejects_a_truncated_photo():
+    data = png(64, 48)
+    with pytest.raises(InvalidPhoto):
+        check_image(data[:len(data) // 2])
+    with pytest.raises(InvalidPhoto):
+        check_image(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+
+
+def test_check_image_rejects_decompression_bombs(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    # Over MAX_IMAGE_PIXELS Pillow only warns, over twice as many it raises
+    for size in ((40, 40), (100, 100)):
+        with pytest.raises(PhotoTooLarge):
+            check_image(png(*size))
+
+
+def test_render_then_remove_variants(tmp_path):
+    render_variants(png(2000, 1000), str(tmp_path), "abc")
+    with Image.open(variant_path(str(tmp_path), "abc", "thumbnail")) as thumbnail:
+        assert thumbnail.size == (VARIANT_SIZES["thumbnail"], VARIANT_SIZES["thumbnail"] // 2)
+
+    remove_variants(str(tmp_path), "abc")
+    assert list(tmp_path.iterdir()) == []
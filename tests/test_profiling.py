@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from profiling import PROFILE_HEADER, PROFILE_ID_HEADER, ProfileStore, ProfilingMiddleware
+
+
+def profiled_app(store: ProfileStore) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, store=store, token="secret")
+    return app
+
+
+def get(app: FastAPI, **kwargs) -> httpx.Response:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/ping", **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_token_is_only_accepted_in_the_header(tmp_path):
+    store = ProfileStore(tmp_path)
+    app = profiled_app(store)
+
+    assert PROFILE_ID_HEADER not in get(app, params={"profile": "secret"}).headers
+    assert PROFILE_ID_HEADER not in get(app, headers={PROFILE_HEADER: "wrong"}).headers
+    assert store.list() == []
+
+    profile_id = get(app, headers={PROFILE_HEADER: "secret"}).headers[PROFILE_ID_HEADER]
+    assert [entry["id"] for entry in store.list()] == [profile_id]
+    assert (tmp_path / f"{profile_id}.pyisession").exists()
+    assert "Recorded:" in asyncio.run(store.render(profile_id, "text"))
+
+
+def test_store_keeps_only_the_newest_sessions(tmp_path):
+    store = ProfileStore(tmp_path, keep=2)
+    app = profiled_app(store)
+
+    ids = [get(app, headers={PROFILE_HEADER: "secret"}).headers[PROFILE_ID_HEADER] for _ in range(3)]
+
+    assert [entry["id"] for entry in store.list()] == ids[:0:-1]
+    assert not (tmp_path / f"{ids[0]}.pyisession").exists()
+    assert asyncio.run(store.render(ids[0], "text")) is None
+    assert {entry["id"] for entry in ProfileStore(tmp_path, keep=2).list()} == set(ids[1:])
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import cursor_of, spot_payload
+
+
+def create_spots(client, count):
+    return [
+        client.post("/api/mushroom-spots", json=spot_payload(notes=f"spot {i}")).json()
+        for i in range(count)
+    ]
+
+
+def test_list_follows_keyset_cursor_newest_first(client):
+    created = create_spots(client, 5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/mushroom-spots", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(page)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    expected = sorted(created, key=lambda spot: (spot["timestamp"], spot["id"]), reverse=True)
+    assert [spot["id"] for spot in seen] == [spot["id"] for spot in expected]
+
+
+def test_list_cursor_skips_spots_with_the_same_timestamp(client, server):
+    timestamp = datetime(2024, 9, 1, 12, 0)
+    ids = ["a", "b", "c"]
+    for spot_id in ids:
+        server.storage.spots._repository._add(
+            {**spot_payload(), "id": spot_id, "timestamp": timestamp, "updated_seq": 0}
+        )
+
+    first = client.get("/api/mushroom-spots", params={"limit": 2})
+    second = client.get("/api/mushroom-spots", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+
+    assert [spot["id"] for spot in first.json()] == ["c", "b"]
+    assert [spot["id"] for spot in second.json()] == ["a"]
+    assert "x-next-cursor" not in second.headers
+
+
+@pytest.mark.parametrize("values", [[1, 2], ["2024-09-01T12:00:00", 3], ["yesterday", "a"], ["2024-09-01"]])
+def test_list_rejects_malformed_cursors(client, values):
+    create_spots(client, 1)
+    assert client.get("/api/mushroom-spots", params={"cursor": cursor_of(values)}).status_code == 400
+
+
+def test_list_accepts_cursor_timestamps_with_an_offset(client):
+    create_spots(client, 1)
+    response = client.get("/api/mushroom-spots", params={"cursor": cursor_of(["2999-01-01T00:00:00+02:00", "z"])})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+def test_list_answers_304_until_a_write(client):
+    create_spots(client, 1)
+    first = client.get("/api/mushroom-spots")
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    cached = client.get("/api/mushroom-spots", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    create_spots(client, 1)
+    changed = client.get("/api/mushroom-spots", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()) == 2
+
+
+def test_etag_depends_on_the_query_and_the_media_type(client):
+    create_spots(client, 1)
+    json_etag = client.get("/api/mushroom-spots").headers["etag"]
+    page_etag = client.get("/api/mushroom-spots", params={"limit": 1}).headers["etag"]
+    msgpack_etag = client.get("/api/mushroom-spots", headers={"Accept": "application/msgpack"}).headers["etag"]
+
+    assert len({json_etag, page_etag, msgpack_etag}) == 3
+
+
+def test_update_with_stale_if_match_is_rejected(client):
+    spot = create_spots(client, 1)[0]
+    url = f"/api/mushroom-spots/{spot['id']}"
+
+    updated = client.put(url, json={"notes": "first"}, headers={"If-Match": f'"{spot["updated_seq"]}"'})
+    assert updated.status_code == 200
+    assert updated.headers["etag"] == f'"{updated.json()["updated_seq"]}"'
+    assert updated.json()["updated_seq"] > spot["updated_seq"]
+
+    stale = client.put(url, json={"notes": "second"}, headers={"If-Match": f'"{spot["updated_seq"]}"'})
+    assert stale.status_code == 412
+    assert client.get(url).json()["notes"] == "first"
+
+
+def test_get_etag_is_accepted_as_if_match(client):
+    spot = create_spots(client, 1)[0]
+    url = f"/api/mushroom-spots/{spot['id']}"
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    updated = client.put(url, json={"notes": "first"}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    assert client.get(url).headers["etag"] == updated.headers["etag"] != etag
+    assert client.put(url, json={"notes": "second"}, headers={"If-Match": etag}).status_code == 412
+
+
+def test_update_if_match_on_a_missing_spot_is_404(client):
+    response = client.put("/api/mushroom-spots/missing", json={"notes": "x"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 404
+
+
+def test_bulk_reports_validation_errors_per_item(client):
+    items = [spot_payload(), {"latitude": "north", "longitude": 5.0, "mushroom_type": "Girolle"}, spot_payload()]
+
+    response = client.post("/api/mushroom-spots/bulk", json=items)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (2, 1)
+    assert body["results"][1]["id"] is None
+    assert body["results"][1]["error"].startswith("latitude")
+    assert all(body["results"][i]["id"] and body["results"][i]["error"] is None for i in (0, 2))
+    assert len(client.get("/api/mushroom-spots").json()) == 2
+
+
+def test_bulk_reports_storage_failures_per_item(client, server, monkeypatch):
+    insert_many = server.storage.spots.insert_many
+
+    async def fail_second(docs):
+        await insert_many(docs[:1] + docs[2:])
+        return {1: "E11000 duplicate key"}
+
+    monkeypatch.setattr(server.storage.spots, "insert_many", fail_second)
+    body = client.post("/api/mushroom-spots/bulk", json=[spot_payload()] * 3).json()
+
+    assert (body["inserted"], body["failed"]) == (2, 1)
+    assert body["results"][1]["error"] == "E11000 duplicate key"
+    assert len(client.get("/api/mushroom-spots").json()) == 2
+
+
+def test_photo_routes_need_mongo(client):
+    response = client.post("/api/mushroom-spots", json=spot_payload(photo_id="some-photo"))
+    assert response.status_code == 503
+    assert client.get("/api/photos/some-photo").status_code == 503
+
+
+def test_viewport_returns_the_newest_spots_in_the_box(client, server, monkeypatch):
+    now = datetime.utcnow()
+    for i, (latitude, longitude) in enumerate([(45.0, 5.0), (45.1, 5.1), (48.0, 2.0)]):
+        server.storage.spots._repository._add({
+            **spot_payload(latitude=latitude, longitude=longitude),
+            "id": f"spot-{i}", "timestamp": now - timedelta(minutes=i), "updated_seq": 0,
+        })
+
+    body = client.get("/api/mushroom-spots/viewport", params={"bbox": "4.5,44.5,5.5,45.5", "zoom": 14}).json()
+
+    assert body["clustered"] is False
+    assert body["truncated"] is False
+    assert [spot["id"] for spot in body["spots"]] == ["spot-0", "spot-1"]
+
+    monkeypatch.setattr(server, "VIEWPORT_MAX_SPOTS", 1)
+    body = client.get("/api/mushroom-spots/viewport", params={"bbox": "4.5,44.5,5.5,45.5", "zoom": 14}).json()
+
+    assert body["truncated"] is True
+    assert [spot["id"] for spot in body["spots"]] == ["spot-0"]
+
+
+@pytest.mark.parametrize("params", [{"radius_km": -1}, {"radius_km": 0}, {"limit": 0}, {"limit": 1001}])
+def test_nearby_rejects_out_of_range_parameters(client, params):
+    assert client.get("/api/mushroom-spots/nearby/45.0/5.0", params=params).status_code == 422
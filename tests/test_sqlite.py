@@ -0,0 +1,68 @@
+"""The API on the SQLite backend, started and stopped through the lifespan."""
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import create_storage
+from tests.conftest import mushroom_payload, spot_payload
+
+
+@pytest.fixture
+def sqlite_client(server, tmp_path):
+    server.storage = create_storage(
+        "sqlite", sqlite_path=str(tmp_path / "mushrooms.sqlite3"), status_ttl_seconds=server.STATUS_CHECK_TTL_SECONDS
+    )
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_spots_round_trip(sqlite_client):
+    created = [
+        sqlite_client.post("/api/mushroom-spots", json=spot_payload(latitude=45.0 + i / 100, notes=f"spot {i}")).json()
+        for i in range(3)
+    ]
+    bulk = sqlite_client.post("/api/mushroom-spots/bulk", json=[spot_payload(), {"latitude": "x"}]).json()
+    assert (bulk["inserted"], bulk["failed"]) == (1, 1)
+
+    page = sqlite_client.get("/api/mushroom-spots", params={"limit": 2})
+    assert len(page.json()) == 2
+    rest = sqlite_client.get("/api/mushroom-spots", params={"cursor": page.headers["x-next-cursor"]}).json()
+    assert len(page.json() + rest) == 4
+
+    url = f"/api/mushroom-spots/{created[0]['id']}"
+    etag = sqlite_client.get(url).headers["etag"]
+    assert sqlite_client.put(url, json={"notes": "updated"}, headers={"If-Match": etag}).status_code == 200
+    assert sqlite_client.put(url, json={"notes": "stale"}, headers={"If-Match": etag}).status_code == 412
+
+    viewport = sqlite_client.get("/api/mushroom-spots/viewport", params={"bbox": "4.5,44.5,5.5,45.5", "zoom": 14})
+    assert len(viewport.json()["spots"]) == 4
+    nearby = sqlite_client.get("/api/mushroom-spots/nearby/45.0/5.0", params={"radius_km": 1}).json()
+    assert nearby[0]["id"] in {created[0]["id"], bulk["results"][0]["id"]}
+
+    assert sqlite_client.delete(url).status_code == 200
+    changes = sqlite_client.get("/api/sync", params={"since": 0}).json()
+    assert len(changes["spots"]) == 3
+    assert [(t["collection"], t["id"]) for t in changes["deleted"]] == [("mushroom_spots", created[0]["id"])]
+
+
+def test_catalog_and_status_round_trip(sqlite_client):
+    girolle = mushroom_payload(common_name="Girolle", latin_name="Cantharellus cibarius")
+    sqlite_client.post("/api/mushrooms", json=girolle)
+    sqlite_client.post("/api/mushrooms", json=mushroom_payload())
+    assert [m["common_name"] for m in sqlite_client.get("/api/mushrooms").json()] == ["Cèpe de Bordeaux", "Girolle"]
+    assert sqlite_client.get("/api/mushrooms", params={"search": "girole"}).json()[0]["common_name"] == "Girolle"
+
+    for name in ("web", "mobile", "web"):
+        sqlite_client.post("/api/status", json={"client_name": name})
+    assert len(sqlite_client.get("/api/status").json()) == 3
+    summary = sqlite_client.get("/api/status/summary").json()
+    assert [(s["client_name"], s["count"]) for s in summary] == [("mobile", 1), ("web", 2)]
+
+
+def test_data_survives_a_restart(server, tmp_path):
+    path = str(tmp_path / "mushrooms.sqlite3")
+    for _ in range(2):
+        server.storage = create_storage("sqlite", sqlite_path=path)
+        with TestClient(server.app) as client:
+            client.post("/api/mushroom-spots", json=spot_payload())
+            count = len(client.get("/api/mushroom-spots").json())
+    assert count == 2
@@ -0,0 +1,34 @@
+from storage import create_storage
+
+
+def test_status_checks_are_listed_newest_first(client):
+    for name in ("web", "mobile", "web"):
+        assert client.post("/api/status", json={"client_name": name}).status_code == 200
+
+    checks = client.get("/api/status").json()
+
+    assert [check["client_name"] for check in checks] == ["web", "mobile", "web"]
+    assert checks[0]["timestamp"] >= checks[-1]["timestamp"]
+    assert len(client.get("/api/status", params={"limit": 2}).json()) == 2
+
+
+def test_expired_checks_are_gone_but_still_counted(client, server):
+    server.storage = create_storage("memory", status_ttl_seconds=0)
+    client.post("/api/status", json={"client_name": "web"})
+    client.post("/api/status", json={"client_name": "web"})
+
+    assert client.get("/api/status").json() == []
+    summary = client.get("/api/status/summary").json()
+    assert [(s["client_name"], s["count"]) for s in summary] == [("web", 2)]
+    assert summary[0]["first_seen"] <= summary[0]["last_seen"]
+
+
+def test_summary_per_client(client):
+    for name in ("web", "mobile", "web"):
+        client.post("/api/status", json={"client_name": name})
+
+    assert [(s["client_name"], s["count"]) for s in client.get("/api/status/summary").json()] == [
+        ("mobile", 1), ("web", 2)
+    ]
+    assert [s["count"] for s in client.get("/api/status/summary", params={"client_name": "web"}).json()] == [2]
+    assert client.get("/api/status/summary", params={"client_name": "tablet"}).json() == []
@@ -0,0 +1,29 @@
+import pytest
+
+from storage import bbox_filter
+
+
+def signed_area(ring):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])) / 2
+
+
+def test_bbox_filter_builds_a_closed_counter_clockwise_polygon():
+    query = bbox_filter(4.5, 44.5, 5.5, 45.5)
+
+    ring = query["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+    assert ring[0] == ring[-1]
+    assert len({tuple(vertex) for vertex in ring[:-1]}) == len(ring) - 1
+    assert signed_area(ring) > 0
+    assert {tuple(vertex) for vertex in ring} >= {(4.5, 44.5), (5.5, 44.5), (5.5, 45.5), (4.5, 45.5)}
+    assert query["latitude"] == {"$gte": 44.5, "$lte": 45.5}
+    assert query["longitude"] == {"$gte": 4.5, "$lte": 5.5}
+
+
+@pytest.mark.parametrize("bbox", [(-180, -60, 180, 60), (-10, 80, 10, 90), (-10, -90, 10, -80), (-180, -90, 180, 90)])
+def test_bbox_filter_uses_ranges_only_when_the_polygon_would_be_degenerate(bbox):
+    min_lon, min_lat, max_lon, max_lat = bbox
+
+    assert bbox_filter(*bbox) == {
+        "latitude": {"$gte": min_lat, "$lte": max_lat},
+        "longitude": {"$gte": min_lon, "$lte": max_lon},
+    }
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+
+from tests.conftest import mushroom_payload, spot_payload
+
+
+def test_sync_returns_changes_and_tombstones_in_order(client):
+    kept = client.post("/api/mushroom-spots", json=spot_payload()).json()
+    deleted = client.post("/api/mushroom-spots", json=spot_payload()).json()
+    mushroom = client.post("/api/mushrooms", json=mushroom_payload()).json()
+    assert client.delete(f"/api/mushroom-spots/{deleted['id']}").status_code == 200
+
+    body = client.get("/api/sync", params={"since": 0}).json()
+
+    assert [spot["id"] for spot in body["spots"]] == [kept["id"]]
+    assert [m["id"] for m in body["mushrooms"]] == [mushroom["id"]]
+    assert [(t["collection"], t["id"]) for t in body["deleted"]] == [("mushroom_spots", deleted["id"])]
+    assert body["deleted"][0]["updated_seq"] == body["next_since"]
+    assert body["has_more"] is False
+
+    empty = client.get("/api/sync", params={"since": body["next_since"]}).json()
+    assert (empty["spots"], empty["mushrooms"], empty["deleted"]) == ([], [], [])
+    assert empty["next_since"] == body["next_since"]
+
+
+def test_sync_pages_through_every_change_once(client):
+    spots = [client.post("/api/mushroom-spots", json=spot_payload()).json() for _ in range(3)]
+    client.delete(f"/api/mushroom-spots/{spots[0]['id']}")
+    client.put(f"/api/mushroom-spots/{spots[1]['id']}", json={"notes": "edited"})
+
+    since, seen = 0, []
+    while True:
+        body = client.get("/api/sync", params={"since": since, "limit": 1}).json()
+        seen.extend([("spot", s["id"]) for s in body["spots"]] + [("deleted", t["id"]) for t in body["deleted"]])
+        since = body["next_since"]
+        if not body["has_more"]:
+            break
+
+    assert sorted(seen) == sorted([("spot", spots[2]["id"]), ("deleted", spots[0]["id"]), ("spot", spots[1]["id"])])
+
+
+def test_catalog_delete_leaves_a_tombstone(client):
+    mushroom = client.post("/api/mushrooms", json=mushroom_payload()).json()
+    since = client.get("/api/sync").json()["next_since"]
+
+    client.delete(f"/api/mushrooms/{mushroom['id']}")
+    body = client.get("/api/sync", params={"since": since}).json()
+
+    assert body["mushrooms"] == []
+    assert [(t["collection"], t["id"]) for t in body["deleted"]] == [("mushroom_database", mushroom["id"])]
+
+
+def test_sync_holds_back_changes_past_a_write_in_flight(server, monkeypatch):
+    insert = server.storage.spots.insert
+
+    async def scenario():
+        first_started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_first_insert(doc):
+            if not first_started.is_set():
+                first_started.set()
+                await release.wait()
+            await insert(doc)
+
+        monkeypatch.setattr(server.storage.spots, "insert", slow_first_insert)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            # The first writer reserves seq N and stalls before committing; the
+            # second reserves N + 1 and commits
+            slow = asyncio.create_task(http.post("/api/mushroom-spots", json=spot_payload(notes="slow")))
+            await first_started.wait()
+            fast = (await http.post("/api/mushroom-spots", json=spot_payload(notes="fast"))).json()
+            assert fast["updated_seq"] == 2
+
+            between = (await http.get("/api/sync")).json()
+            assert between["spots"] == []
+            assert between["next_since"] == 0
+
+            release.set()
+            slow_spot = (await slow).json()
+            assert slow_spot["updated_seq"] == 1
+            after = (await http.get("/api/sync", params={"since": between["next_since"]})).json()
+            assert [spot["id"] for spot in after["spots"]] == [slow_spot["id"], fast["id"]]
+
+    asyncio.run(scenario())